@@ -1,192 +1,304 @@
-import random
+import atexit
+import html
+from contextlib import contextmanager, nullcontext
 
 import streamlit as st
 import os
-from graphviz import Digraph
 
-from comments import Comments
+from cache import LRUCache
+from data_map import ASSET, DATA_ELEMENT, MODEL, PROCESSING_ACTIVITY, VENDOR, DataMap
+from db import ConnectionPool, mysql_connection_factory
+from instrumentation import metrics
+from lineage import LineageIndex
+from model_registry import ModelRegistry, register_model
+from narratives import (AI_GOVERNANCE_NARRATIVE, CONSENT_NARRATIVE, COOKIES_NARRATIVE, DATA_DISCOVERY_NARRATIVE,
+                        DSAR_NARRATIVE, LINEAGE_NARRATIVE, OVERVIEW_NARRATIVE, PURPOSES_NARRATIVE,
+                        VENDOR_ENGAGEMENTS_NARRATIVE)
+from purpose_propagation import PurposePropagation
+from visualization import ClusteredRenderer, DotRenderer, SvgRenderer
 
+# Modules pulling in heavy dependencies (aiohttp, pyarrow, multiprocessing, the Cloud SQL connector) are imported
+# by the section that uses them, the first time it is opened
 
-def set_env():
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = st.secrets["GOOGLE_APPLICATION_CREDENTIALS"]
-    os.environ["SQL_SERVER"] = st.secrets["SQL_SERVER"]
-    os.environ["SQL_DATABASE"] = st.secrets["SQL_DATABASE"]
-    os.environ["SQL_USERNAME"] = st.secrets["SQL_USERNAME"]
-    os.environ["SQL_PASSWORD"] = st.secrets["SQL_PASSWORD"]
-    os.environ["MYSQL_CONNECTION_STRING"] = st.secrets["MYSQL_CONNECTION_STRING"]
+SUGGESTIONS_PAGE_SIZE = 20
+DATA_ELEMENT_OPTIONS = ['Name', 'Phone Number', 'SSN', 'Email', 'Address']
+SVG_CACHE_ENTRIES = 128
+SVG_CACHE_BYTES = 64 * 1024 * 1024
+DETAILED_VIEW_MAX_NODES = 300
+ALL_NODES = "Whole data map"
+SUGGESTION_CATEGORIES = ["Consent", "Cookies", "Data Discovery", "DSAR", "Other"]
 
 
-def main():
-    st.set_page_config(layout="wide")
-    st.markdown("""
-    <style>
-        html, body, [class*="css"] {
-            font-size: 20px;
-        }
-    </style>
-    """, unsafe_allow_html=True)
-
-    st.title("Platform Integration")
-    set_env()
+@st.cache_resource
+def get_settings():
+    from settings import load_settings
 
-    # Introduction about Data Map and its importance
-    data_map_intro = """
-        **Data Mapping Overview**
+    # Loaded and validated once per process, reruns never touch the environment or the file system
+    try:
+        secrets = st.secrets.to_dict()
+    except FileNotFoundError:
+        secrets = {}
+    return load_settings(secrets)
 
-        At the core of our platform lies the Data Map, a pivotal component orchestrating the myriad interactions and processes. This framework is built upon fundamental concepts including Assets, Processing Activities, Legal Entities, and Vendors, each serving a distinct role in the comprehensive management and safeguarding of data.
-        """
 
-    integration_narrative = """
-        **Enhancing Platform Integration through Comprehensive Data Mapping**
+@st.cache_resource
+def get_snapshot_records(path: str):
+    from snapshot import read_snapshot
 
-        As we strive for a seamless and comprehensive integration across our platform, the integration of key components such as Consent, Cookies, Data Subject Access Requests (DSAR), and Data Discovery with Data Mapping is essential. This strategic alignment is crucial for elevating our platform's functionality, compliance, and user trust.
+    return read_snapshot(path)
 
-        **Consent Integration**: Ensures that user preferences are accurately reflected across all data processing activities, enabling more granular control and transparency over personal data usage.
 
-        **Cookies Management**: By integrating Cookies Management with Data Mapping, users are given precise control over their data, enhancing privacy protections in line with their consent preferences.
+def data_map_shared():
+    return os.environ.get("DATA_MAP_SHARED", "").lower() in ("1", "true", "yes")
 
-        **DSAR Fulfillment**: Streamlines the processing of Data Subject Access Requests, ensuring comprehensive, accurate, and timely responses, thereby reinforcing our commitment to user rights and regulatory compliance.
 
-        **Data Discovery**: Plays a critical role in identifying and classifying data across various sources, ensuring that every piece of data is accurately mapped and managed within our platform.
+@st.cache_resource
+def get_data_map_replica():
+    from data_map_store import DataMapReplica, DataMapStore
 
-        Achieving a fully integrated Data Mapping system fortifies our compliance posture and enhances user trust, making our platform not just compliant with current regulations but also ready for the future of data privacy.
-    """
+    store = DataMapStore(get_comments().pool)
+    store.create_schema()
+    return DataMapReplica(store)
 
-    st.markdown(data_map_intro + integration_narrative)
 
-    # UI for selecting data elements
-    data_elements_options = ['Name', 'Phone Number', 'SSN', 'Email', 'Address']
-
-    if "processing_activities" not in st.session_state:
-        st.session_state["processing_activities"] = {}
-    if "assets" not in st.session_state:
-        st.session_state["assets"] = {}
-
-    # Process consent
-    process_consent(data_elements_options)
-
-    # DSAR Form
-    process_dsar()
-
-    # Process DD
-    process_dd(data_elements_options)
-
-    # Process Cookies
-    process_cookies()
-
-    # Process models
-    process_model_creation()
-
-    # Process vendor engagements
-    process_vendor_engagements()
-
-    process_purposes()
+def get_data_map() -> DataMap:
+    # In shared mode every session reads the process-wide replica of the stored map
+    if data_map_shared():
+        return get_data_map_replica().refresh()
+    if "data_map" not in st.session_state:
+        # Cold start from the saved snapshot in a single load when there is one
+        snapshot_path = os.environ.get("DATA_MAP_SNAPSHOT")
+        if snapshot_path and os.path.isdir(snapshot_path):
+            st.session_state["data_map"] = DataMap.from_records(*get_snapshot_records(snapshot_path))
+        else:
+            st.session_state["data_map"] = DataMap()
+    return st.session_state["data_map"]
 
-    # Process comments
-    process_comments()
 
+@contextmanager
+def edit_data_map():
+    if data_map_shared():
+        # Changes are written through to the store when the block exits
+        with get_data_map_replica().edit() as data_map:
+            yield data_map
+    else:
+        yield get_data_map()
 
-def process_purposes():
-    st.header("Purposes as First Class Citizens")
 
-    # Introduction to Purposes
-    introduction_to_purposes = """
-        **Introduction to Purposes**
+def data_map_lock():
+    return get_data_map_replica().lock if data_map_shared() else nullcontext()
 
-        There are three fundamental questions that a privacy governance platform should be able to answer:
 
-        1. What data do I have? This pertains to privacy. An enterprise typically has data stored across hundreds of systems, used in various ways. For the data governance persona, the initial step is to understand all the data the enterprise possesses.
+@st.cache_resource
+def get_shared_lineage_index():
+    # The replica's map is updated in place, so one closure serves every session and is updated under its lock
+    return LineageIndex(get_data_map_replica().data_map)
 
-        2. Why do I have the data? Understanding the purpose is crucial. Enterprises collect data for specific purposes, and these must be identified and documented. This is vital for ensuring that enterprises have the necessary user consents, as they may otherwise unknowingly violate regulatory compliance.
 
-        3. What are my responsibilities with this data? Enterprises must understand their obligations regarding user data, including compliance with regulations such as data masking and deletion based on retention policies.
+@st.cache_resource
+def get_comments():
+    from comments import Comments
+    from comments_schema import migrate
 
-        The platform provides tools such as multimodal data discovery methods, including assessments, imports, data mapping, and data discovery, to answer the first question, This pertains to privacy, as an enterprise typically has data stored across hundreds of systems, used in various ways. For the data governance persona, the initial step is to understand all the data the enterprise possesses.
+    comments = Comments(ConnectionPool(mysql_connection_factory(get_settings()), max_size=5))
+    # Bring the tables and indexes up to date once per process
+    migrate(comments.pool)
+    return comments
 
-        The platform also offers the consent platform to capture consents from users, addressing the second question. However, it falls short in connecting this with the data we discover. This crucial aspect is addressed in the following sections.
 
-        Finally our platform continues to address the third question by providing tools to handle data responsibly. We help enterprises understand their obligations when handling customer data, flag risks, and recommend controls, with GRC playing a significant role.
-        """
+@st.cache_resource
+def get_query_plan_warnings():
+    from comments_schema import check_query_plans
 
-    # Purpose Management Overview
-    purpose_management_overview = """
-        **Purpose Management Overview**
+    return check_query_plans(get_comments())
 
-        Purpose management is a critical aspect of our privacy tech platform, providing the foundation for linking data to specific use cases or intentions. This functionality enables enterprises to manage and track the reasons for which personal data is processed, ensuring compliance with privacy regulations and enhancing data governance practices.
-        """
 
-    # Linking Purposes to Data
-    linking_purposes_to_data = """
-        **Linking Purposes to Data**
+@st.cache_resource
+def get_comment_writer():
+    from comments import CommentWriter
 
-        This functionality allows data stewards to select objects from the catalog and link them to one or more purposes. By linking purposes to data, enterprises can ensure that data processing activities are aligned with the intended use cases and purposes specified in their privacy policies. The process of linking identified data to purposes shows a central list of purposes maintained on the consent platform, ensuring consistency and accuracy.
-        """
+    comment_writer = CommentWriter(get_comments())
+    # Write out the queued suggestions when the server stops
+    atexit.register(comment_writer.close)
+    return comment_writer
 
-    # Surfacing Purposes from Central List
-    surfacing_purposes = """
-        **Surfacing Purposes from Central List**
 
-        Purposes are maintained centrally on the consent platform. When linking identified data to purposes, users can select from a central list of purposes, ensuring consistency and accuracy across the platform.
-        """
+@st.cache_resource
+def get_category_summarizer():
+    from summarization import CategorySummarizer
 
-    # Adding New Purposes
-    adding_new_purposes = """
-        **Adding New Purposes**
+    summarizer = CategorySummarizer(get_comments(), SUGGESTION_CATEGORIES)
+    atexit.register(summarizer.close)
+    return summarizer
 
-        Enterprises often need to add new purposes dynamically to reflect changes in data processing activities or to comply with new regulatory requirements. This functionality enables users to add new purposes on the fly, ensuring that the platform remains flexible and adaptable to evolving privacy needs. The purpose discovery process automatically updates the central purpose repository, unifying all purposes in the platform.
-        """
 
-    # Launching Purpose Discovery Assessments
-    launching_purpose_discovery = """
-        **Launching Purpose Discovery Assessments**
+@st.cache_resource
+def get_consent_ledger():
+    from consent_ledger import ConsentLedger
 
-        Purpose discovery assessments are crucial for capturing purposes from different teams and departments within an organization. This functionality streamlines the process of gathering purpose information, ensuring that all relevant stakeholders are involved in defining and documenting data processing purposes.
-        """
+    consent_ledger = ConsentLedger(os.environ.get("CONSENT_LEDGER_PATH", "consent_ledger.jsonl"))
+    # Flush the last group commit when the server stops
+    atexit.register(consent_ledger.close)
+    return consent_ledger
 
-    # Updating Asset Discovery Templates
-    updating_asset_discovery_templates = """
-        **Updating Asset Discovery Templates**
 
-        Asset discovery templates need to be updated to capture purposes associated with data elements. This functionality ensures that purposes are included in the data discovery process, providing visibility into how data is being used and for what purposes.
-        """
+@st.cache_resource
+def get_svg_renderer():
+    return SvgRenderer(LRUCache(max_entries=SVG_CACHE_ENTRIES, max_bytes=SVG_CACHE_BYTES))
 
-    # Backpropagating Newly Discovered Purposes to Consent Module
-    backpropagating_new_purposes = """
-        **Backpropagating Newly Discovered Purposes to Consent Module**
 
-        This functionality enables the persona to create new collection points to gather consents for newly discovered purposes. By backpropagating purposes to the consent module, enterprises can ensure that all data processing activities have appropriate consents in place.
-        """
+def main():
+    st.set_page_config(layout="wide")
+    st.markdown("""
+    <style>
+        html, body, [class*="css"] {
+            font-size: 20px;
+        }
+    </style>
+    """, unsafe_allow_html=True)
 
-    # Updating Data Map with Purposes
-    updating_data_map_with_purposes = """
-        **Updating Data Map with Purposes**
+    st.title("Platform Integration")
 
-        The data map is updated with purposes linked to data elements, along with granular stats on how many users have consented to these purposes and how many haven't. This provides a comprehensive view of data usage and consent status across the organization.
-        """
+    # The toggle is drawn last so the trace covers the whole rerun, its value is already in the session state. A
+    # trace only instruments this session's rerun, INSTRUMENTATION turns it on for the whole process.
+    debug_timings = st.session_state.get("debug_timings", False)
+    metrics.enabled = os.environ.get("INSTRUMENTATION", "").lower() in ("1", "true", "yes")
+    if debug_timings:
+        metrics.start_trace()
+    try:
+        with metrics.span("rerun"):
+            render_page()
+    finally:
+        st.sidebar.toggle("Show timings", key="debug_timings")
+        if debug_timings:
+            render_debug_panel(metrics.end_trace())
+
+
+def render_debug_panel(trace):
+    with st.sidebar.expander("Timings", expanded=True):
+        st.code("\n".join(f"{'  ' * depth}{name}: {seconds * 1000:.2f} ms" for name, depth, seconds in trace)
+                or "Nothing recorded.", language=None)
+        st.download_button("Export JSON", metrics.to_json(), file_name="metrics.json", mime="application/json")
+        st.download_button("Export Prometheus", metrics.to_prometheus(), file_name="metrics.prom",
+                           mime="text/plain")
+
+
+def render_page():
+    # UI for selecting data elements
+    data_elements_options = DATA_ELEMENT_OPTIONS
+
+    sections = {
+        # Introduction about Data Map and its importance
+        "Overview": lambda: st.markdown(OVERVIEW_NARRATIVE),
+        "Consent": lambda: process_consent(data_elements_options),
+        "DSAR": process_dsar,
+        "Data Discovery": lambda: process_dd(data_elements_options),
+        "Cookies": process_cookies,
+        "AI Governance": process_model_creation,
+        "Vendor Engagements": process_vendor_engagements,
+        "Lineage": process_lineage,
+        "Purposes": process_purposes,
+        "Suggestions": process_comments,
+    }
+    section = st.sidebar.radio("Section:", list(sections), key="section")
+
+    st.sidebar.toggle("Render data map on the server", key="server_side_render",
+                      disabled=not get_svg_renderer().available)
+    st.sidebar.radio("Data map view:", ["Detailed", "Clustered"], key="data_map_view")
+    if st.session_state["data_map_view"] == "Clustered" or len(get_data_map()) > DETAILED_VIEW_MAX_NODES:
+        data_map = get_data_map()
+        drill_down_options = [ALL_NODES] + [name for kind in (PROCESSING_ACTIVITY, ASSET, VENDOR, MODEL)
+                                            for name in data_map.names(kind)]
+        st.sidebar.selectbox("Drill into:", drill_down_options, key="data_map_focus")
+
+    snapshot_path = os.environ.get("DATA_MAP_SNAPSHOT")
+    if snapshot_path and st.sidebar.button("Save data map snapshot"):
+        from snapshot import export_snapshot
+
+        export_snapshot(get_data_map(), snapshot_path)
+        get_snapshot_records.clear()
+        st.sidebar.success(f"Data map saved to {snapshot_path}.")
+
+    # Only the open section runs, a rerun never pays for the others, their imports or their database work
+    with metrics.span(f"section.{section}"):
+        sections[section]()
+
+
+def process_lineage():
+    st.header("Data Map Lineage")
+    st.markdown(LINEAGE_NARRATIVE)
+
+    data_map = get_data_map()
+    # The reachability index is kept up to date from the data map journal instead of being rebuilt per query
+    if data_map_shared():
+        lineage = get_shared_lineage_index()
+    else:
+        if "lineage_index" not in st.session_state:
+            st.session_state["lineage_index"] = LineageIndex(data_map)
+        lineage = st.session_state["lineage_index"]
+    with data_map_lock():
+        lineage.update()
+        names = [name for kind in (PROCESSING_ACTIVITY, ASSET, VENDOR, MODEL) for name in data_map.names(kind)]
+    if not names:
+        st.info("Add processing activities, assets, vendors or models to query their lineage.")
+        return
+
+    query = st.radio("Query:", ["Who can touch a data element", "Downstream", "Upstream", "Path"], horizontal=True,
+                     key="lineage_query")
+    with data_map_lock():
+        if query == "Who can touch a data element":
+            element = st.selectbox("Data element:", DATA_ELEMENT_OPTIONS, key="lineage_element")
+            for kind, title in ((VENDOR, "Vendors"), (MODEL, "Models")):
+                labels = sorted(data_map.node(name).label for name in lineage.touching(element, kind))
+                st.markdown(f"**{title}:** {', '.join(labels) or 'none'}")
+        elif query in ("Downstream", "Upstream"):
+            name = st.selectbox("Node:", names, key="lineage_node")
+            reached = lineage.downstream(name) if query == "Downstream" else lineage.upstream(name)
+            for kind, title in ((PROCESSING_ACTIVITY, "Processing Activities"), (ASSET, "Assets"),
+                                (DATA_ELEMENT, "Data Elements"), (VENDOR, "Vendors"), (MODEL, "Models")):
+                labels = sorted({data_map.node(node).label for node in reached if data_map.node(node).kind == kind})
+                if labels:
+                    st.markdown(f"**{title}:** {', '.join(labels)}")
+            if not reached:
+                st.markdown("Nothing.")
+        else:
+            source = st.selectbox("From:", names, key="lineage_source")
+            target = st.selectbox("To:", names, key="lineage_target")
+            path = lineage.shortest_path(source, target)
+            st.markdown(" → ".join(data_map.node(name).label for name in path) if path
+                        else f"'{target}' is not reachable from '{source}'.")
+    st.caption(f"Lineage index updated in {lineage.stats['seconds'] * 1000:.2f} ms.")
 
-    # Building Tooling to Surface Data Subject Level Consent Data
-    building_tooling_to_surface_consent_data = """
-        **Building Tooling to Surface Data Subject Level Consent Data**
 
-        Tooling is built to surface data subject level consent data based on identified purposes. This data is then sent back to third party systems or teams to ensure that they are using only data for which they have user consent, thus ensuring compliance with privacy regulations.
-        """
+def process_purposes():
+    st.header("Purposes as First Class Citizens")
 
     # Displaying the purpose management overview and functionalities
-    st.markdown(introduction_to_purposes)
-    st.markdown(purpose_management_overview)
-    st.markdown(linking_purposes_to_data)
-    st.markdown(surfacing_purposes)
-    st.markdown(adding_new_purposes)
-    st.markdown(launching_purpose_discovery)
-    st.markdown(updating_asset_discovery_templates)
-    st.markdown(backpropagating_new_purposes)
-    st.markdown(updating_data_map_with_purposes)
-    st.markdown(building_tooling_to_surface_consent_data)
+    st.markdown(PURPOSES_NARRATIVE)
+
+    # Backpropagate purposes through the data map, only the part of the map that changed since the last run is
+    # re-tagged
+    data_map = get_data_map()
+    if "purpose_propagation" not in st.session_state:
+        st.session_state["purpose_propagation"] = PurposePropagation(data_map)
+    propagation = st.session_state["purpose_propagation"]
+    with data_map_lock():
+        propagation.update()
+        purposes = data_map.names(PROCESSING_ACTIVITY)
+    st.caption(f"Purposes propagated to {propagation.stats['touched']} nodes "
+               f"in {propagation.stats['seconds'] * 1000:.1f} ms.")
+    if purposes:
+        purpose = st.selectbox("Show what a purpose reaches:", purposes, key="propagated_purpose")
+        with data_map_lock():
+            tagged = [data_map.node(name) for name in propagation.tagged(purpose) if name != purpose]
+        for kind, title in ((ASSET, "Assets"), (DATA_ELEMENT, "Data Elements"), (VENDOR, "Vendors"),
+                            (MODEL, "Models")):
+            labels = sorted({node.label for node in tagged if node is not None and node.kind == kind})
+            st.markdown(f"**{title}:** {', '.join(labels) or 'none'}")
 
 
 def process_comments():
-    comments = Comments()
-    comments.connect()
+    comments = get_comments()
 
     st.subheader("Have a suggestion?")
     # Detailed question displayed to the user
@@ -194,68 +306,88 @@ def process_comments():
         We invite you to examine the data map closely and share any suggestions for enhancements or additional elements ...
     """, unsafe_allow_html=True)
 
-    suggestion_type = st.selectbox("Select a Category:", ["Consent", "Cookies", "Data Discovery", "DSAR", "Other"],
-                                   key="suggestion_type")
+    suggestion_type = st.selectbox("Select a Category:", SUGGESTION_CATEGORIES, key="suggestion_type")
     user_suggestion = st.text_area("Leave your suggestion here:")
 
+    # Page cursors loaded so far for the selected category, None is the newest page
+    cursors_key = f"suggestion_cursors_{suggestion_type}"
+    if cursors_key not in st.session_state:
+        st.session_state[cursors_key] = [None]
+
+    comment_writer = get_comment_writer()
     if st.button("Submit", type="primary") and user_suggestion:
-        # Add the new user comment along with its category
-        comments.add_user_comment(user_suggestion, suggestion_type)
+        # Queue the new user comment along with its category, it is written to the database in the background
+        comment_writer.submit(user_suggestion, suggestion_type)
+        st.session_state[cursors_key] = [None]
         st.success("Thank you for your suggestion!")
-
-    # Display all comments for the selected category
-    all_suggestions = comments.get_user_comments_by_category(suggestion_type)
-    # Display all comments for the selected category
-    for suggestion, suggestion_type, created_at in all_suggestions:
-        st.markdown(
-            f"""
-            <div style="margin: 10px 0; padding: 10px; background-color: #f9f9f9; border-left: 5px solid #4CAF50;">
-                <p style="margin: 0;"><span style="font-size: small;">Category: {suggestion_type}</span></p>
-                <pre style="white-space: pre-wrap; word-wrap: break-word; margin: 0;">{suggestion}</pre>
-                <sub>Posted on {created_at}</sub>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-    comments.close()
+    st.caption(f"{comment_writer.depth} suggestions waiting to be saved, last save took "
+               f"{comment_writer.stats['last_flush_seconds'] * 1000:.0f} ms.")
+    if st.session_state.get("debug_timings"):
+        # Hot queries that fell back to a full scan or a sort, see comments_schema.check_query_plans
+        for name, problems in get_query_plan_warnings().items():
+            st.warning(f"Query plan of the {name}: {'; '.join(problems)}.")
+
+    # Summary of the category kept up to date by the background summarizer
+    from summarization import format_summary, load_summary
+
+    get_category_summarizer()
+    summary = format_summary(load_summary(comments, suggestion_type))
+    st.markdown(summary or "No suggestions have been summarized for this category yet.")
+
+    with st.expander("Browse all suggestions"):
+        # Display the suggestions still waiting to be saved, then the loaded pages of comments for the selected
+        # category, one markdown block per page
+        pending = comment_writer.pending(suggestion_type)
+        if pending:
+            st.markdown("".join(render_suggestion(suggestion, category, "just now")
+                                for suggestion, category in pending), unsafe_allow_html=True)
+        next_cursor = None
+        for after in st.session_state[cursors_key]:
+            page, next_cursor = comments.get_user_comments_page(suggestion_type, SUGGESTIONS_PAGE_SIZE, after)
+            st.markdown("".join(render_suggestion(*row) for row in page), unsafe_allow_html=True)
+
+        if next_cursor is not None and st.button("Load more", key="load_more_suggestions"):
+            st.session_state[cursors_key].append(next_cursor)
+            st.rerun()
+
+
+def render_suggestion(suggestion, suggestion_type, created_at):
+    return f"""
+        <div style="margin: 10px 0; padding: 10px; background-color: #f9f9f9; border-left: 5px solid #4CAF50;">
+            <p style="margin: 0;"><span style="font-size: small;">Category: {html.escape(suggestion_type)}</span></p>
+            <pre style="white-space: pre-wrap; word-wrap: break-word; margin: 0;">{html.escape(suggestion)}</pre>
+            <sub>Posted on {created_at}</sub>
+        </div>
+        """
 
 
 def process_cookies():
     st.header("Cookies Data Mapping Integration")
-    st.markdown("""
-        **Cookies Data Mapping Integration:** This integration enhances user privacy and data governance by mapping cookies to assets within the Data Map. It allows for precise control over cookie data, aligning with user consent and regulatory requirements. By scanning website domains for cookies and categorizing them accurately in the Data Map, we ensure transparency and compliance in how cookie data is handled.
-    """)
+    st.markdown(COOKIES_NARRATIVE)
     website_domain = st.text_input("Enter the website domain to scan for cookies:", key="website_domain")
 
     if st.button("Scan Cookies", type="primary"):
         if website_domain:
-            # Check if the website domain already exists as an asset in Data Mapping
-            if website_domain not in st.session_state.get("assets", {}):
-                # If the website domain doesn't exist, create a new entry
-                st.session_state["assets"][website_domain] = []
-
-            # Randomly pick a list of vendors from the given options
-            vendors_list = ["Microsoft", "Google", "Meta", "Salesforce"]
-            selected_vendors = random.sample(vendors_list, random.randint(1, len(vendors_list)))
-
-            # Ensure "vendors" and "links" session variables are initialized
-            if "vendors" not in st.session_state:
-                st.session_state["vendors"] = []
-            if "links" not in st.session_state:
-                st.session_state["links"] = []
-
-            # Add selected vendors to the session and create links
-            for vendor in selected_vendors:
-                if vendor not in st.session_state["vendors"]:
-                    st.session_state["vendors"].append(vendor)
-                # Create a link between the asset (website domain) and the vendor
-                if (website_domain, vendor) not in st.session_state["links"]:
-                    st.session_state["links"].append((website_domain, vendor))
+            # Crawl the site and map the cookies and third-party scripts it sets to vendors
+            from cookie_scanner import CookieScanner
+
+            with st.spinner(f"Scanning {website_domain} for cookies..."):
+                scan = CookieScanner().scan(website_domain)
+            selected_vendors = sorted(scan.vendors)
+
+            with edit_data_map() as data_map:
+                # Register the website domain as an asset in Data Mapping along with the cookies it sets
+                data_map.add_node(website_domain, ASSET, cookies=[name for name, _ in scan.cookies])
+
+                # Add the vendors found to the data map and link them to the asset (website domain)
+                for vendor in selected_vendors:
+                    data_map.add_node(vendor, VENDOR)
+                    data_map.add_edge(website_domain, vendor)
 
             # Display the vendors found as part of the scanning result
-            vendors_found = ", ".join(selected_vendors)
-            st.success(f"Cookies scanned and added for {website_domain}. Vendors found: {vendors_found}.")
+            vendors_found = ", ".join(selected_vendors) or "none"
+            st.success(f"Scanned {scan.pages} pages of {website_domain} and found {len(scan.cookies)} cookies. "
+                       f"Vendors found: {vendors_found}.")
             visualize_data_map()
         else:
             st.error("Please enter a website domain.")
@@ -265,72 +397,79 @@ def process_vendor_engagements():
     st.header("Vendor Engagements")
 
     # Using the rewritten description for Vendor Engagements
-    st.markdown("""
-    **Vendor Engagements for Comprehensive Risk Management:**
-    Vendor risk management is an essential element of any privacy strategy. The OneTrust platform enhances this by offering capabilities to import vendors and assess their risks. With the growing need for oversight over third, fourth, and fifth-party vendors, managing these complex relationships becomes more challenging. OneTrust simplifies this by allowing these multi-tier vendor engagements to be grouped under a single framework, enabling consistent risk management across all vendor levels.
-    """)
+    st.markdown(VENDOR_ENGAGEMENTS_NARRATIVE)
 
     # UI to capture engagement name and select third-party vendors, ensuring no duplicates
     engagement_name = st.text_input("Enter Engagement Name:", key="engagement_name")
     predefined_vendors = ["Microsoft", "Google", "Meta", "Salesforce"]
-    session_vendors = st.session_state.get("vendors", [])
+    session_vendors = get_data_map().names(VENDOR)
     available_vendors = sorted(set(predefined_vendors + session_vendors))
 
     third_party_vendors = st.multiselect("Select Third-Party Vendors:", available_vendors, key="third_party_vendors")
 
     if st.button("Create Engagement", type="primary"):
         if engagement_name and third_party_vendors:
-            # Represent the engagement as a processing activity
-            if "processing_activities" not in st.session_state:
-                st.session_state["processing_activities"] = {}
-            st.session_state["processing_activities"][engagement_name] = []
-
-            # Link the third-party vendors to the processing activity
-            if "links" not in st.session_state:
-                st.session_state["links"] = []
-            for vendor in third_party_vendors:
-                if (engagement_name, vendor) not in st.session_state["links"]:
-                    st.session_state["links"].append((engagement_name, vendor))
-
-                if vendor not in st.session_state.get("vendors", []):
-                    if "vendors" not in st.session_state:
-                        st.session_state["vendors"] = []
-                    st.session_state["vendors"].append(vendor)
+            with edit_data_map() as data_map:
+                # Represent the engagement as a processing activity
+                data_map.add_node(engagement_name, PROCESSING_ACTIVITY)
+
+                # Link the third-party vendors to the processing activity
+                for vendor in third_party_vendors:
+                    data_map.add_node(vendor, VENDOR)
+                    data_map.add_edge(engagement_name, vendor)
 
             visualize_data_map()
 
             st.success(
                 f"Engagement '{engagement_name}' with vendors {', '.join(third_party_vendors)} has been successfully added to the Data Map.")
 
+    # Bulk onboarding of whole vendor inventories, validated in one pass and applied to the data map in one edit
+    st.subheader("Bulk Onboarding")
+    st.markdown("Upload a CSV or JSONL file with `engagement`, `vendors`, `asset` and `elements` columns. "
+                "Vendors and data elements are separated by semicolons in CSV and given as lists in JSONL.")
+    onboarding_file = st.file_uploader("Engagements, assets and data elements:", type=["csv", "jsonl", "ndjson"],
+                                       key="onboarding_file")
+    if onboarding_file is not None and st.button("Onboard", key="onboard"):
+        from onboarding import detect_format, onboard
+
+        text = onboarding_file.getvalue().decode("utf-8", errors="replace")
+        with edit_data_map() as data_map:
+            result = onboard(data_map, text, detect_format(onboarding_file.name), DATA_ELEMENT_OPTIONS)
+        st.success(f"Onboarded {result.rows - result.rejected} of {result.rows} rows in {result.seconds:.2f}s: "
+                   f"{result.nodes_added} nodes, {result.elements_added} data elements and {result.edges_added} "
+                   f"links added.")
+        if result.errors:
+            st.error(f"{len(result.errors)} problems found in {result.rejected} rows, those rows were skipped.")
+            st.dataframe([{"Line": line_number, "Error": error} for line_number, error in result.errors],
+                         width="stretch")
+
+    # Vendor risk, rescored from the data map journal and consent ledger for the vendors a change can affect only
+    st.subheader("Vendor Risk")
+    from vendor_risk import VendorRiskIndex
+
+    data_map = get_data_map()
+    if "vendor_risk" not in st.session_state:
+        st.session_state["vendor_risk"] = VendorRiskIndex(data_map)
+    vendor_risk = st.session_state["vendor_risk"]
+    top_vendors = st.number_input("Riskiest vendors to show:", min_value=1, max_value=100, value=10,
+                                  key="top_vendors")
+    with data_map_lock():
+        vendor_risk.update(get_consent_ledger().granted_purposes())
+        rows = [{"Vendor": risk.vendor, "Risk": risk.score, "Data Elements": ", ".join(risk.elements),
+                 "Assets": len(risk.assets), "Activities": len(risk.activities),
+                 "Consent Coverage": f"{risk.coverage:.0%}"} for risk in vendor_risk.top(top_vendors)]
+    if rows:
+        st.dataframe(rows, width="stretch")
+        st.caption(f"Top {len(rows)} of {len(vendor_risk)} vendors, rescored {vendor_risk.stats['rescored']} "
+                   f"times in {vendor_risk.stats['runs']} updates.")
+    else:
+        st.info("No vendors in the data map yet.")
+
 
 def process_dd(data_elements_options):
     st.header("Data Discovery Data Mapping Integration")
 
-    data_discovery_integration_narrative = """
-        **Optimizing Data Management through Data Discovery Integration**
-
-        Data Discovery serves as the cornerstone of our platform's approach to proactive data management and compliance. By connecting to a multitude of data sources, Data Discovery delves deep into the digital expanse, extracting and classifying the wealth of data contained within. This process is not just about uncovering data; it's about understanding its nature, relevance, and implications for privacy and compliance.
-
-        **Initiating Data Discovery:**
-
-        The journey begins with the identification of data sources. Users are prompted to provide the name of the data source, setting the stage for a comprehensive scanning and classification process. This step is pivotal, as it not only earmarks the source for exploration but also tailors the discovery process to the unique characteristics of each data repository.
-
-        **Scanning and Classification:**
-
-        Following the identification of the data source, the next phase involves the meticulous scanning of the source, with a keen eye on the Personally Identifiable Information (PII) it harbors. Users select the PIIs of interest, guiding the classification engine in its quest to map the data landscape accurately. This simulation of scanning and classification embodies our platform's commitment to precision and thoroughness in data discovery.
-
-        **Integration into Data Mapping:**
-
-        The culmination of Data Discovery is marked by the seamless integration of findings into the Data Map. Each data source, once defined and scanned, is elevated to the status of an Asset within the Data Map. Concurrently, the discovered PIIs are meticulously cataloged as Data Elements under this newly minted Asset. This integration is a testament to our holistic view of data management, where every piece of information is accounted for, its origins traced, and its implications understood.
-
-        **A Unified Approach to Data Governance:**
-
-        By integrating Data Discovery with Data Mapping, we achieve a unified approach to data governance. This strategy not only enhances our ability to manage data with unparalleled precision but also strengthens our compliance posture. Each Asset and its associated Data Elements become integral components of our Data Map, enriching it with insights and intelligence gleaned from the farthest reaches of our digital ecosystem.
-
-        The integration of Data Discovery with Data Mapping is not merely a procedural enhancement; it's a strategic pivot towards more insightful, compliant, and effective data governance. It underscores our commitment to harnessing the full potential of our data assets while safeguarding the privacy and security of the information entrusted to us.
-        """
-
-    st.markdown(data_discovery_integration_narrative)
+    st.markdown(DATA_DISCOVERY_NARRATIVE)
 
     # Data Discovery - User inputs
     dd_data_source = st.text_input("Enter the data source name:", key="dd_data_source")
@@ -339,22 +478,36 @@ def process_dd(data_elements_options):
     dd_selected_pii = st.multiselect("Select the PIIs discovered in the data source:", data_elements_options,
                                      key="dd_pii")
 
+    # Data Discovery - optional file to scan and classify, only files under the configured data directory can be
+    # picked so visitors cannot open arbitrary paths on the server
+    dd_source_path = None
+    data_directory = os.environ.get("DATA_DISCOVERY_DIR")
+    if data_directory and os.path.isdir(data_directory):
+        from data_discovery import list_sources
+
+        dd_source = st.selectbox("CSV, JSONL or Parquet file to scan for PII (optional):",
+                                 [""] + list_sources(data_directory), key="dd_source_path")
+        dd_source_path = os.path.join(data_directory, dd_source) if dd_source else None
+
     # Button to add Data Discovery information to DM
     if st.button("Discover", type="primary"):
-        if dd_data_source and dd_selected_pii:
-            # Ensure "assets" is initialized in session state
-            if "assets" not in st.session_state:
-                st.session_state["assets"] = {}
-
-            # Check if the data source already exists as an asset in Data Mapping
-            if dd_data_source in st.session_state["assets"]:
-                # Append new PII types to the existing list, avoiding duplicates
-                current_pii_types = st.session_state["assets"][dd_data_source]
-                updated_pii_types = list(set(current_pii_types + dd_selected_pii))
-                st.session_state["assets"][dd_data_source] = updated_pii_types
-            else:
-                # If the data source doesn't exist, create a new entry
-                st.session_state["assets"][dd_data_source] = dd_selected_pii
+        if dd_data_source and (dd_selected_pii or dd_source_path):
+            discovered_pii = []
+            if dd_source_path:
+                from data_discovery import DataDiscovery
+
+                try:
+                    with st.spinner(f"Scanning {dd_source} for PII..."):
+                        discovered_pii = DataDiscovery().discover(dd_source_path)
+                except (OSError, ValueError) as e:
+                    st.error(f"Could not scan {dd_source}: {e}")
+                    return
+                st.info(f"PIIs discovered in {dd_source}: {', '.join(discovered_pii) or 'none'}.")
+
+            # Create the asset if needed and append new PII types to it, avoiding duplicates
+            with edit_data_map() as data_map:
+                data_map.add_node(dd_data_source, ASSET)
+                data_map.add_elements(dd_data_source, dd_selected_pii + discovered_pii)
 
             st.success(f"Data Discovery information for '{dd_data_source}' has been added successfully.")
             visualize_data_map()
@@ -364,12 +517,7 @@ def process_dd(data_elements_options):
 
 def process_dsar():
     st.header("DSAR Data Mapping Integration")
-    st.markdown("""
-        **Streamlining DSAR Integration into Data Mapping**
-        The essence of Data Subject Access Requests (DSAR) transcends the mere act of solicitation for personal data; it marks a critical intersection of user empowerment and systemic transparency. Integrating DSAR with Data Mapping amplifies this synergy, embodying our commitment to operational excellence and regulatory adherence.
-        ...
-        By navigating this path, we set a new benchmark for data stewardship, one that harmonizes the intricacies of Data Mapping with the fundamental rights of our users. The journey of integrating DSAR with Data Mapping is a vivid reflection of our dedication to privacy, precision, and proactive engagement.
-    """)
+    st.markdown(DSAR_NARRATIVE)
 
     # User-defined DSAR Request Type
     dsar_request_type = st.text_input("Enter DSAR Request Type:", key="dsar_request_type")
@@ -385,32 +533,55 @@ def process_dsar():
         else:
             st.error("Please enter a DSAR request type and select at least one data element.")
 
+    # Fulfil the request against every asset in the data map that holds the selected data elements
+    data_subject_id = st.text_input("Enter the data subject identifier:", key="data_subject_id")
+    if st.button("Fulfil DSAR", key="fulfil_dsar"):
+        if dsar_request_type and selected_data_elements and data_subject_id:
+            from dsar import DsarEngine, locate_elements, resolve_assets
+
+            progress_bar = st.progress(0.0, text="Resolving assets from the data map...")
+
+            def report_progress(finished, total, result):
+                progress_bar.progress(finished / total,
+                                      text=f"{finished}/{total} assets, {result.asset}: {result.status}")
+
+            with data_map_lock():
+                assets = resolve_assets(get_data_map(), selected_data_elements)
+            engine = DsarEngine()
+            results, package = engine.fulfil(assets, dsar_request_type, data_subject_id, selected_data_elements,
+                                             progress=report_progress)
+            if not results:
+                st.warning("No asset in the data map holds the selected data elements.")
+            else:
+                failed = [result.asset for result in results if result.status == "failed"]
+                if failed:
+                    st.error(f"Could not reach {', '.join(failed)}.")
+                # Until assets carry connection details the default job only says where the data lives
+                if engine.job is locate_elements:
+                    st.success(f"DSAR '{dsar_request_type}': the selected data elements were located in "
+                               f"{len(results) - len(failed)} assets. No subject data was exported.")
+                    st.download_button("Download location report", package,
+                                       file_name=f"dsar_{data_subject_id}_locations.zip", mime="application/zip")
+                else:
+                    st.success(f"DSAR '{dsar_request_type}' fulfilled across {len(results) - len(failed)} assets.")
+                    st.download_button("Download export package", package, file_name=f"dsar_{data_subject_id}.zip",
+                                       mime="application/zip")
+        else:
+            st.error("Please enter a DSAR request type, select data elements and enter a data subject identifier.")
+
 
 def create_processing_activity(dsar_request_type, selected_data_elements):
-    if "processing_activities" not in st.session_state:
-        st.session_state["processing_activities"] = {}
-
-    # Directly use the DSAR request type as the key for the processing activity
-    st.session_state["processing_activities"][dsar_request_type] = selected_data_elements
+    with edit_data_map() as data_map:
+        # Directly use the DSAR request type as the name of the processing activity
+        data_map.add_node(dsar_request_type, PROCESSING_ACTIVITY)
+        data_map.set_elements(dsar_request_type, selected_data_elements)
 
     st.success(f"DSAR request '{dsar_request_type}' has been created successfully.")
 
 
 def process_consent(data_elements_options):
     st.header("Consent Data Mapping Integration")
-    consent_integration_text = """
-        In the realm of data privacy and compliance, the **Consent Integration** process plays a pivotal role, primarily focusing on the seamless interplay between **Purposes**, **Data Elements**, and **Collection Points**. This process is foundational for ensuring that user consents are meticulously captured, managed, and integrated within the Data Mapping infrastructure, thereby adhering to regulatory requirements and safeguarding user privacy.
-
-        **Collection Points:** The avenues through which user consents are obtained—ranging from web forms to mobile applications—are abstracted as Collection Points. These points are not just channels of interaction but are critical in capturing the context of user consents, delineating the specific conditions under which user data may be collected and processed.
-
-        **Purposes:** At the heart of the Consent Integration process lies the Purpose. It serves as a transparent declaration to users, outlining the intent behind data collection. This clarity is crucial for obtaining informed consents, thereby instilling trust and ensuring compliance with data protection regulations. Within the Data Mapping framework, each Purpose is intricately linked to a Processing Activity, endowed with a property known as the Legal Basis. It is this Legal Basis that imbues the Processing Activity with regulatory legitimacy, directly stemming from the user's consent.
-
-        **Data Elements:** The Consent Integration process acknowledges the dynamic nature of data collection by allowing for the creation and selection of Data Elements. These elements form the substantive content of consent. Upon selection, these Data Elements are now published to Data Mapping, where they are meticulously mapped to the corresponding Collection Point, ensuring a direct relationship between where the data is collected and the data itself.
-
-        This structured approach to Consent Integration enhances the transparency and accountability of data processing activities by explicitly linking Collection Points to Data Elements and Purposes to Processing Activities, ensuring every piece of user data is managed with the utmost respect for user privacy and legal compliance.
-    """
-
-    st.markdown(consent_integration_text)
+    st.markdown(CONSENT_NARRATIVE)
 
     # UI to get inputs from the user
     collection_point = st.text_input("Enter the collection point for data collection:", key="collection_point")
@@ -419,40 +590,54 @@ def process_consent(data_elements_options):
 
     if st.button("Integrate Consent", type="primary"):
         if collection_point and purpose and selected_data_elements:
-            # Update Processing Activities
-            if "processing_activities" not in st.session_state:
-                st.session_state["processing_activities"] = {}
-            st.session_state["processing_activities"][purpose] = []
-
-            # Update Assets
-            if "assets" not in st.session_state:
-                st.session_state["assets"] = {}
-            st.session_state["assets"][collection_point] = selected_data_elements
-
-            # Update Links
-            if "links" not in st.session_state:
-                st.session_state["links"] = []
-            # Don't duplicate
-            if (purpose, collection_point) not in st.session_state.get("links", []):
-                st.session_state["links"].append((purpose, collection_point))
+            with edit_data_map() as data_map:
+                # Update Processing Activities
+                data_map.add_node(purpose, PROCESSING_ACTIVITY)
+
+                # Update Assets
+                data_map.add_node(collection_point, ASSET)
+                data_map.set_elements(collection_point, selected_data_elements)
+
+                # Update Links, duplicates are ignored by the data map
+                data_map.add_edge(purpose, collection_point)
 
             st.success("Consent integration has been successfully processed.")
             visualize_data_map()
         else:
             st.error("Please fill in all fields to integrate consent.")
 
+    # Record consent decisions of individual data subjects in the consent ledger
+    subject_id = st.text_input("Enter the data subject identifier:", key="consent_subject_id")
+    consent_ledger = get_consent_ledger()
+    grant_column, withdraw_column = st.columns(2)
+    granted = None
+    if grant_column.button("Grant Consent", key="grant_consent"):
+        granted = True
+    if withdraw_column.button("Withdraw Consent", key="withdraw_consent"):
+        granted = False
+    if granted is not None:
+        if subject_id and collection_point and purpose:
+            from consent_ledger import ConsentEvent
+
+            consent_ledger.record(ConsentEvent(subject_id, collection_point, purpose, selected_data_elements, granted))
+            st.success(f"Consent {'granted' if granted else 'withdrawn'} for '{subject_id}' and purpose '{purpose}'.")
+        else:
+            st.error("Please enter a data subject, collection point and purpose to record consent.")
+    if subject_id and purpose:
+        allowed = [element for element in data_elements_options
+                   if consent_ledger.may_process(subject_id, purpose, element)]
+        st.caption(f"'{subject_id}' may be processed for '{purpose}': {', '.join(allowed) or 'no data elements'}.")
+
 
 def process_model_creation():
     st.header("AI Governance")
-    st.markdown("""
-        **AI Governance:**
-        The OneTrust Platform introduces a comprehensive AI Governance solution designed to empower customers in the oversight of their AI initiatives. Central to this governance is the Model object, a construct that encapsulates the essence of an AI model, ensuring transparency and accountability. Through the Model object, users have the capability to define critical attributes such as the model's name, its descriptive overview, and its intended purpose. This facilitates a meticulous recording of the AI model's parameters, including the datasets it relies upon, which may carry inherent biases. By capturing this information, the platform aids in identifying and mitigating potential biases, ensuring AI implementations are both ethical and effective. Each Model object is integrated within the platform's data map where the model object is linked to its purpose, captured as a Processing Activity, providing a clear and structured representation of how AI models interact with and impact data governance landscapes.
-    """)
+    st.markdown(AI_GOVERNANCE_NARRATIVE)
 
     # Predefined processing activities
     predefined_activities = ["Loan Approval Process", "Account Validation Process", "Credit Check Process"]
     # Adding existing activities from session state if available
-    existing_activities = list(st.session_state.get("processing_activities", {}).keys())
+    data_map = get_data_map()
+    existing_activities = data_map.names(PROCESSING_ACTIVITY)
     all_activities = predefined_activities + existing_activities
     unique_activities = list(set(all_activities))  # Ensure activities are unique
 
@@ -460,6 +645,10 @@ def process_model_creation():
     model_description = st.text_area("Model Description:", key="model_description")
     model_purpose_options = ["Select a processing activity...", "Add new processing activity"] + unique_activities
     model_purpose = st.selectbox("Model Purpose:", model_purpose_options, key="model_purpose")
+    model_elements = st.multiselect("Input Data Elements:", DATA_ELEMENT_OPTIONS, key="model_elements")
+    model_assets = st.multiselect("Source Assets:", data_map.names(ASSET), key="model_assets")
+    model_vendors = st.multiselect("Vendors:", data_map.names(VENDOR), key="model_vendors")
+    model_version = st.text_input("Model Version:", key="model_version")
 
     # Handling the case where "Add new processing activity" is selected
     if model_purpose == "Add new processing activity":
@@ -467,34 +656,23 @@ def process_model_creation():
 
         # Button to create a new processing activity
         if st.button("Create New Processing Activity", key="create_new_pa"):
-            # Ensure "processing_activities" is initialized in session state
-            if "processing_activities" not in st.session_state:
-                st.session_state["processing_activities"] = {}
             # Add the new processing activity
-            if model_purpose not in st.session_state["processing_activities"]:
-                st.session_state["processing_activities"][model_purpose] = []
+            with edit_data_map() as data_map:
+                data_map.add_node(model_purpose, PROCESSING_ACTIVITY)
             st.success(f"Processing activity '{model_purpose}' has been created successfully.")
-    elif model_purpose != "Select a processing activity...":
-        if "processing_activities" not in st.session_state:
-            st.session_state["processing_activities"] = {}
-        # Add the new processing activity
-        st.session_state["processing_activities"][model_purpose] = []
+    elif model_purpose != "Select a processing activity..." and model_purpose not in data_map:
+        # Add the processing activity, keeping any data elements it already has
+        with edit_data_map() as data_map:
+            data_map.add_node(model_purpose, PROCESSING_ACTIVITY)
 
     if model_purpose not in ["Select a processing activity...", "Add new processing activity"] and st.button(
             "Create Model", type="primary"):
-        if model_name and model_description:
-            # Initialize "models" if not already in session state
-            if "models" not in st.session_state:
-                st.session_state["models"] = {}
-            # Add the new model
-            st.session_state["models"][model_name] = {"description": model_description, "purpose": model_purpose}
-
-            # Use "links" to record both asset-collection point and model-processing activity relationships
-            if "links" not in st.session_state:
-                st.session_state["links"] = []
-            # Record the model-processing activity link
-            if (model_purpose, model_name) not in st.session_state.get("links", []):
-                st.session_state["links"].append((model_purpose, model_name))
+        if model_name and model_description and model_purpose:
+            with edit_data_map() as data_map:
+                # Register the model with its inputs, sources and vendors, linking it to the processing activity and
+                # creating the activity if it was only typed in
+                register_model(data_map, model_name, model_description, model_purpose, model_elements, model_assets,
+                               model_vendors, model_version or None)
 
             st.success(
                 f"Model '{model_name}' has been created successfully and linked to the processing activity '{model_purpose}'.")
@@ -503,78 +681,66 @@ def process_model_creation():
 
         visualize_data_map()
 
+    # Impact analysis over the model registry, answered from its inverted indexes
+    st.subheader("Model Impact Analysis")
+    if "model_registry" not in st.session_state:
+        st.session_state["model_registry"] = ModelRegistry(data_map)
+    registry = st.session_state["model_registry"]
+    with data_map_lock():
+        registry.update()
+        withdrawn_purposes = st.multiselect("Withdraw consent for purposes:", data_map.names(PROCESSING_ACTIVITY),
+                                            key="impact_purposes")
+        deleted_assets = st.multiselect("Delete assets:", data_map.names(ASSET), key="impact_assets")
+        removed_vendors = st.multiselect("Remove vendors:", data_map.names(VENDOR), key="impact_vendors")
+        report = registry.impact_report(withdrawn_purposes, deleted_assets, removed_vendors)
+        rows = [{"Model": model, "Versions": ", ".join(registry.record(model)["versions"]), "Impact": "; ".join(reasons)}
+                for model, reasons in sorted(report.items())]
+    if withdrawn_purposes or deleted_assets or removed_vendors:
+        if rows:
+            st.warning(f"{len(rows)} of {len(data_map.names(MODEL))} models are impacted.")
+            st.dataframe(rows, width="stretch")
+        else:
+            st.success("No model is impacted.")
 
-def visualize_data_map():
-    dot = Digraph(comment='Data Map Visualization', format='svg')  # Use SVG for better text rendering
-
-    # Adjusting the default font size and name for all nodes
-    dot.attr('node', fontsize='12', fontname='Helvetica bold')  # Specifying a bold font
-
-    # Node attribute configurations for different categories
-    processing_activities_attrs = {'style': 'filled', 'color': '#1BB3F0'}
-    assets_attrs = {'style': 'filled', 'color': 'orange'}
-    models_attrs = {'style': 'filled', 'color': 'yellow'}
-    vendors_attrs = {'style': 'filled', 'color': '#CD9F4A'}
-    element_attrs = {'style': 'filled', 'color': '#CCF01B'}
-
-    # Creating the root node
-    dot.node('Data Map', '<<b>Data Map</b>>', shape='folder', style='filled', color='lightgrey')
-
-    # Visualize Processing Activities with specific attributes
-    for activity, elements in st.session_state.get("processing_activities", {}).items():
-        dot.node(activity, f"<<b>{activity}</b>>", **processing_activities_attrs)
-        dot.edge('Data Map', activity)
-        for element in elements:
-            element_node = f'{activity}_{element}'
-            dot.node(element_node, f"<<b>{element}</b>>", **element_attrs)
-            dot.edge(activity, element_node)
-
-    # Visualize Assets and Data Elements with specific attributes
-    for asset, elements in st.session_state.get("assets", {}).items():
-        dot.node(asset, f"<<b>{asset}</b>>", **assets_attrs)
-        dot.edge('Data Map', asset)
-        for element in elements:
-            element_node = f'{asset}_{element}'
-            dot.node(element_node, f"<<b>{element}</b>>", **element_attrs)
-            dot.edge(asset, element_node)
-
-    # If "models" are maintained separately, visualize them
-    for model, details in st.session_state.get("models", {}).items():
-        dot.node(model, f"<<b>{model}</b>>", **models_attrs)
-
-    # If "vendors" are maintained separately, visualize them
-    for vendor in st.session_state.get("vendors", []):
-        dot.node(vendor, f"<<b>{vendor}</b>>", **vendors_attrs)
-
-    # Utilize "links" session variable for connecting nodes directly
-    for source, target in st.session_state.get("links", []):
-        dot.edge(source, target)
-
-    # Define colors for different categories (for legend)
-    colors = {
-        'Processing Activities': '#1BB3F0',
-        'Assets': 'orange',
-        'Models': 'yellow',
-        'Vendors': '#CD9F4A',
-        'Data Elements': '#CCF01B',
-    }
-
-    # Constructing the legend HTML with left-aligned text
-    legend_html = '''<<table border="0" cellborder="0" cellspacing="2" cellpadding="2" style="margin-left:auto; margin-right:0;">'''
-    legend_html += '''<tr><td colspan="2" align="left"><b>Legend</b></td></tr>'''  # Ensure the 'Legend' title aligns left
-
-    for label, color in colors.items():
-        legend_html += f'''<tr>
-                             <td width="20" height="20" bgcolor="{color}">&nbsp;</td>
-                             <td align="left">{label}</td>  # Align text to the left
-                           </tr>'''
-    legend_html += '</table>>'
-
-    # Add the legend node to the graph with 'plaintext' shape for no surrounding shape
-    dot.node('legend', legend_html, shape='plaintext')
 
-    # Display the graph
-    st.graphviz_chart(dot.source)
+def visualize_data_map():
+    data_map = get_data_map()
+    # The renderers cache the DOT source against the data map version
+    if "dot_renderer" not in st.session_state:
+        st.session_state["dot_renderer"] = DotRenderer(data_map)
+        st.session_state["clustered_renderer"] = ClusteredRenderer(data_map)
+
+    # Large maps default to the clustered view with data elements collapsed into counts
+    detailed = (st.session_state.get("data_map_view", "Detailed") == "Detailed"
+                and len(data_map) <= DETAILED_VIEW_MAX_NODES)
+    with data_map_lock():
+        if detailed:
+            dot_renderer = st.session_state["dot_renderer"]
+            source, digest = dot_renderer.source(), dot_renderer.digest()
+        else:
+            focus = st.session_state.get("data_map_focus", ALL_NODES)
+            source = st.session_state["clustered_renderer"].source(None if focus == ALL_NODES else focus)
+            digest = None
+
+    # Display the graph, laid out on the server when enabled so the browser only has to paint the SVG
+    svg_renderer = get_svg_renderer()
+    with metrics.span("data_map.chart"):
+        svg = None
+        if st.session_state.get("server_side_render") and svg_renderer.available:
+            import subprocess
+
+            try:
+                svg = svg_renderer.render(source, digest)
+            except subprocess.TimeoutExpired:
+                st.warning(f"Server-side layout took longer than {svg_renderer.timeout:.0f}s, "
+                           f"rendering in the browser instead.")
+            except subprocess.CalledProcessError as e:
+                st.warning(f"Server-side layout failed ({e.stderr.decode(errors='replace').strip() or e}), "
+                           f"rendering in the browser instead.")
+        if svg is not None:
+            st.markdown(f'<div style="overflow: auto;">{svg}</div>', unsafe_allow_html=True)
+        else:
+            st.graphviz_chart(source)
 
 
 if __name__ == "__main__":
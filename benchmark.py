@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+from cache import LRUCache
+from comments import Comments
+from comments_schema import migrate
+from data_map import ASSET, DATA_ELEMENT, MODEL, PROCESSING_ACTIVITY, VENDOR, DataMap, element_node_name
+from db import ConnectionPool, sqlite_connection_factory
+from lineage import LineageIndex
+from purpose_propagation import PurposePropagation
+from vendor_risk import VendorRiskIndex
+from visualization import ClusteredRenderer, DotRenderer, SvgRenderer
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+ELEMENTS = ["Name", "Phone Number", "SSN", "Email", "Address"]
+CATEGORIES = ["Consent", "Cookies", "Data Discovery", "DSAR", "Other"]
+# Graphviz layout grows much faster than linearly, the detailed SVG is only laid out up to this many nodes
+MAX_SVG_NODES = 2000
+
+
+def synthetic_records(size: int, seed: int = 0):
+    # Roughly size nodes in the proportions the app produces: assets carrying two data elements each, activities
+    # linking assets, vendors and models
+    rng = random.Random(seed)
+    activities = [f"activity_{i}" for i in range(max(1, size // 10))]
+    assets = [f"asset_{i}" for i in range(max(1, size // 4))]
+    vendors = [f"vendor_{i}" for i in range(max(1, size // 20))]
+    models = [f"model_{i}" for i in range(max(1, size // 20))]
+    nodes = [(name, PROCESSING_ACTIVITY, None, {}) for name in activities]
+    nodes += [(name, ASSET, None, {}) for name in assets]
+    nodes += [(name, VENDOR, None, {}) for name in vendors]
+    nodes += [(name, MODEL, None, {"description": "", "purpose": rng.choice(activities)}) for name in models]
+    edges = []
+    for asset in assets:
+        for element in rng.sample(ELEMENTS, 2):
+            element_node = element_node_name(asset, element)
+            nodes.append((element_node, DATA_ELEMENT, element, {"owner": asset, "element": element}))
+            edges.append((asset, element_node))
+        edges.append((asset, rng.choice(vendors)))
+    for activity in activities:
+        edges.extend((activity, asset) for asset in rng.sample(assets, min(3, len(assets))))
+        edges.append((activity, rng.choice(vendors)))
+    edges.extend((node[3]["purpose"], node[0]) for node in nodes if node[1] == MODEL)
+    return nodes, list(dict.fromkeys(edges))
+
+
+def build_incrementally(nodes, edges):
+    data_map = DataMap()
+    for name, kind, label, attrs in nodes:
+        if kind == DATA_ELEMENT:
+            data_map.add_elements(attrs["owner"], [attrs["element"]])
+        else:
+            data_map.add_node(name, kind, label, **attrs)
+    for source, target in edges:
+        data_map.add_edge(source, target)
+    return data_map
+
+
+def timed(func, repeat: int):
+    # Best of repeat runs, setup is done by the caller so only func is measured
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+class Benchmark:
+    def __init__(self, sizes, repeat: int = 3, only: str = None):
+        self.sizes = sizes
+        self.repeat = repeat
+        self.only = only
+        self.results = []
+
+    def measure(self, name: str, size: int, func, operations: int = None, repeat: int = None):
+        if self.only and not name.startswith(self.only):
+            return None
+        seconds, result = timed(func, repeat or self.repeat)
+        operations = operations or size
+        self.results.append({
+            "benchmark": name,
+            "size": size,
+            "seconds": seconds,
+            "operations": operations,
+            "per_second": operations / seconds if seconds else None,
+        })
+        print(f"{name:<28} {size:>9} {seconds * 1000:>12.2f} ms")
+        return result
+
+    def run_data_map(self, size: int):
+        nodes, edges = synthetic_records(size)
+        total = len(nodes) + len(edges)
+        self.measure("data_map.build", size, lambda: build_incrementally(nodes, edges), total, repeat=1)
+        data_map = DataMap.from_records(nodes, edges)
+        self.measure("data_map.from_records", size, lambda: DataMap.from_records(nodes, edges), total)
+        # Re-adding links that already exist, what every form submission does for its own links
+        self.measure("data_map.dedupe", size, lambda: sum(data_map.add_edge(*edge) for edge in edges), len(edges))
+
+        self.measure("dot.full", size, lambda: DotRenderer(data_map).source(), len(data_map))
+        renderer = DotRenderer(data_map)
+        renderer.source()
+        activities = data_map.names(PROCESSING_ACTIVITY)
+        assets = data_map.names(ASSET)
+
+        def incremental():
+            data_map.add_edge(random.choice(activities), random.choice(assets))
+            return renderer.source()
+
+        self.measure("dot.incremental", size, incremental, 1)
+        self.measure("dot.clustered", size, lambda: ClusteredRenderer(data_map).source(), len(data_map))
+        self.measure("lineage.build", size, lambda: LineageIndex(data_map).update(), len(data_map), repeat=1)
+        self.measure("purposes.build", size, lambda: PurposePropagation(data_map).update(), len(data_map), repeat=1)
+        self.measure("vendor_risk.build", size, lambda: VendorRiskIndex(data_map).update(), len(data_map), repeat=1)
+
+        svg_renderer = SvgRenderer(LRUCache(max_entries=1))
+        if svg_renderer.available:
+            clustered = ClusteredRenderer(data_map).source()
+            self.measure("render.clustered_svg", size,
+                         lambda: SvgRenderer(LRUCache(max_entries=1)).render(clustered), 1, repeat=1)
+            if len(data_map) <= MAX_SVG_NODES:
+                source = renderer.source()
+                self.measure("render.svg", size, lambda: SvgRenderer(LRUCache(max_entries=1)).render(source), 1,
+                             repeat=1)
+
+    def run_comments(self, size: int):
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "comments.db")
+            pool = ConnectionPool(sqlite_connection_factory(database), dialect="sqlite")
+            migrate(pool)
+            comments = Comments(pool)
+            rng = random.Random(size)
+            rows = [(f"Suggestion {i} about the {rng.choice(ELEMENTS)} handling", rng.choice(CATEGORIES))
+                    for i in range(size)]
+            self.measure("comments.insert", size, lambda: comments.add_user_comments(rows, 1000), repeat=1)
+
+            def first_page():
+                comments.cache.clear()
+                return comments.get_user_comments_page("Consent", 20)
+
+            def deep_pages():
+                comments.cache.clear()
+                after = None
+                for _ in range(50):
+                    _, after = comments.get_user_comments_page("Consent", 20, after)
+                    if after is None:
+                        break
+
+            def whole_category():
+                comments.cache.clear()
+                return comments.get_user_comments_by_category("Consent")
+
+            self.measure("comments.first_page", size, first_page, 20)
+            self.measure("comments.deep_pages", size, deep_pages, 50 * 20)
+            self.measure("comments.whole_category", size, whole_category)
+            pool.close()
+
+    def run(self):
+        for size in self.sizes:
+            self.run_data_map(size)
+            self.run_comments(size)
+        return self.results
+
+    def report(self):
+        return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "repeat": self.repeat,
+            "results": self.results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data map, renderers and comments store.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Data map nodes and comment rows to benchmark, e.g. 1000 10000 1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark, the best one is reported")
+    parser.add_argument("--only", help="Only run benchmarks whose name starts with this prefix")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(args.sizes, args.repeat, args.only)
+    benchmark.run()
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(benchmark.report(), output, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,278 @@
-import os
-import tempfile
-from google.cloud.sql.connector import Connector
+import threading
+import time
+
+from cache import TTLCache
+from db import ConnectionPool, PoolExhausted
+from instrumentation import metrics
+
+# Errors worth retrying, the connection dropped or the server was briefly unavailable (pymysql and sqlite3 both
+# raise OperationalError for these)
+TRANSIENT_ERRORS = ("OperationalError", "InterfaceError")
+
+
+def is_transient(error: Exception):
+    return isinstance(error, PoolExhausted) or type(error).__name__ in TRANSIENT_ERRORS
 
 
 class Comments:
-    def __init__(self):
-        self.connection = None
-
-    def connect(self):
-        with tempfile.NamedTemporaryFile(mode="w", delete=False) as temp_file:
-            temp_file.write(os.environ["GOOGLE_APPLICATION_CREDENTIALS"])
-            temp_file_path = temp_file.name
-
-        # Use the temporary file path as the value for GOOGLE_APPLICATION_CREDENTIALS
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_file_path
-
-        instance_connection_name = os.environ[
-            "MYSQL_CONNECTION_STRING"
-        ]
-        db_user = os.environ["SQL_USERNAME"]
-        db_pass = os.environ["SQL_PASSWORD"]
-        db_name = os.environ["SQL_DATABASE"]
-
-        self.connection = Connector().connect(
-            instance_connection_name,
-            "pymysql",
-            user=db_user,
-            password=db_pass,
-            db=db_name,
-        )
+    def __init__(self, pool: ConnectionPool, cache_ttl: float = 60.0, cache_entries: int = 1024):
+        self.pool = pool
+        # Every page cursor any session loads is cached, bounded so deep browsing cannot grow it without limit
+        self.cache = TTLCache(cache_ttl, cache_entries)
 
+    @metrics.timed("comments.add_user_comment")
     def add_user_comment(self, comment: str, comment_type: str):
-        cursor = self.connection.cursor()
-        cursor.execute(
-            """
-            INSERT INTO user_comments (comment_text, type)
-            VALUES (%s, %s)
-            """,
-            (comment, comment_type)
-        )
-        self.connection.commit()
-        cursor.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                INSERT INTO user_comments (comment_text, type)
+                VALUES (%s, %s)
+                """,
+                (comment, comment_type)
+            )
+            connection.commit()
+            cursor.close()
+        self.cache.invalidate_prefix(comment_type, "All")
 
+    @metrics.timed("comments.add_user_comments")
+    def add_user_comments(self, comments, batch_size: int = 500):
+        # comments are (comment, comment_type) pairs, written with one multi-row INSERT per batch in one transaction
+        comments = list(comments)
+        if not comments:
+            return
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            for start in range(0, len(comments), batch_size):
+                batch = comments[start:start + batch_size]
+                values = ", ".join(["(%s, %s)"] * len(batch))
+                cursor.execute(f"INSERT INTO user_comments (comment_text, type) VALUES {values}",
+                               tuple(value for comment in batch for value in comment))
+            connection.commit()
+            cursor.close()
+        self.cache.invalidate_prefix(*{comment_type for _, comment_type in comments}, "All")
+
+    @metrics.timed("comments.get_user_comments_by_category")
     def get_user_comments_by_category(self, category: str):
-        cursor = self.connection.cursor()
-        if category == "All":
+        cached = self.cache.get((category,))
+        if cached is not None:
+            return cached
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            if category == "All":
+                query = """
+                    SELECT comment_text, type, created_at FROM user_comments
+                    ORDER BY created_at DESC
+                    """
+                cursor.execute(query)
+            else:
+                query = """
+                    SELECT comment_text, type, created_at FROM user_comments
+                    WHERE type = %s
+                    ORDER BY created_at DESC
+                    """
+                cursor.execute(query, (category,))
+            comments = cursor.fetchall()
+            cursor.close()
+        self.cache.set((category,), comments)
+        return comments
+
+    def _page_query(self, category: str, after):
+        conditions = []
+        params = []
+        if category != "All":
+            conditions.append("type = %s")
+            params.append(category)
+        if after is not None:
+            created_at, comment_id = after
+            conditions.append("(created_at < %s OR (created_at = %s AND id < %s))")
+            params.extend([created_at, created_at, comment_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT id, comment_text, type, created_at FROM user_comments
+            {where}
+            ORDER BY created_at DESC, id DESC
+            """
+        return query, params
+
+    def iter_user_comments_since(self, category: str, since=None, batch_size: int = 500):
+        # Oldest first from just after the (created_at, id) high-water mark
+        conditions = ["type = %s"]
+        params = [category]
+        if since is not None:
+            created_at, comment_id = since
+            conditions.append("(created_at > %s OR (created_at = %s AND id > %s))")
+            params.extend([created_at, created_at, comment_id])
+        query = f"""
+            SELECT id, comment_text, type, created_at FROM user_comments
+            WHERE {' AND '.join(conditions)}
+            ORDER BY created_at, id
+            """
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, tuple(params))
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+
+    @metrics.timed("comments.get_user_comments_page")
+    def get_user_comments_page(self, category: str, page_size: int = 20, after=None):
+        # Keyset pagination on (created_at, id): returns the page and the cursor for the next one
+        key = (category, page_size, after)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        query, params = self._page_query(category, after)
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query + " LIMIT %s", tuple(params) + (page_size + 1,))
+            rows = cursor.fetchmany(page_size + 1)
+            cursor.close()
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = (rows[-1][3], rows[-1][0])
+        page = ([row[1:] for row in rows], next_cursor)
+        self.cache.set(key, page)
+        return page
+
+    @metrics.timed("comments.update_category_summary")
+    def update_category_summary(self, category: str, summary: str):
+        if self.pool.dialect == "sqlite":
             query = """
-                SELECT comment_text, type, created_at FROM user_comments
-                ORDER BY created_at DESC
+                INSERT INTO category_summaries (category, summary)
+                VALUES (%s, %s)
+                ON CONFLICT (category) DO UPDATE SET summary = excluded.summary
                 """
-            cursor.execute(query)
         else:
             query = """
-                SELECT comment_text, type, created_at FROM user_comments
-                WHERE type = %s
-                ORDER BY created_at DESC
+                INSERT INTO category_summaries (category, summary)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE summary = VALUES(summary)
                 """
-            cursor.execute(query, (category))
-        comments = cursor.fetchall()
-        cursor.close()
-        return comments
-
-    def update_category_summary(self, category: str, summary: str):
-        cursor = self.connection.cursor()
-        cursor.execute(
-            """
-            INSERT INTO category_summaries (category, summary)
-            VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE summary = VALUES(summary)
-            """,
-            (category, summary)
-        )
-        self.connection.commit()
-        cursor.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, (category, summary))
+            connection.commit()
+            cursor.close()
+        self.cache.invalidate((category, "summary"))
 
+    @metrics.timed("comments.get_category_summary")
     def get_category_summary(self, category: str):
-        cursor = self.connection.cursor()
-        cursor.execute(
-            """
-            SELECT summary FROM category_summaries
-            WHERE category = %s
-            ORDER BY id DESC
-            """,
-            (category,)
-        )
-        summary = cursor.fetchone()
-        cursor.close()
-        return summary[0] if summary else None
+        key = (category, "summary")
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT summary FROM category_summaries
+                WHERE category = %s
+                """,
+                (category,)
+            )
+            summary = cursor.fetchone()
+            cursor.close()
+        summary = summary[0] if summary else None
+        if summary is not None:
+            self.cache.set(key, summary)
+        return summary
+
+
+class CommentWriter:
+    def __init__(self, comments: Comments, flush_interval: float = 0.2, max_batch: int = 500, max_retries: int = 5,
+                 backoff: float = 0.5):
+        self.comments = comments
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = {"submitted": 0, "written": 0, "failed": 0, "flushes": 0, "retries": 0,
+                      "last_flush_seconds": 0.0, "last_error": None}
+
+        self._pending = []
+        self._in_flight = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        # Sequence of the last submitted comment and of the last one that is written or given up on
+        self._submitted_seq = 0
+        self._done_seq = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="comment-writer", daemon=True)
+        self._writer.start()
+
+    @property
+    def depth(self):
+        # Comments acknowledged but not yet written, including the batch being written
+        return self._submitted_seq - self._done_seq
+
+    def submit(self, comment: str, comment_type: str):
+        with self._lock:
+            if self._closed:
+                raise ValueError("Comment writer is closed.")
+            self._pending.append((comment, comment_type))
+            self._submitted_seq += 1
+            self.stats["submitted"] += 1
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+
+    def pending(self, category: str):
+        # Comments acknowledged but not written yet, newest first, so the author sees their own suggestion
+        with self._lock:
+            comments = self._in_flight + self._pending
+        return [comment for comment in reversed(comments) if category == "All" or comment[1] == category]
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.comments.add_user_comments(batch, self.max_batch)
+                self.stats["written"] += len(batch)
+                break
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                if not is_transient(e) or attempt == self.max_retries:
+                    self.stats["failed"] += len(batch)
+                    break
+                self.stats["retries"] += 1
+                time.sleep(self.backoff * 2 ** attempt)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_seconds"] = time.perf_counter() - started
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending and not self._closed:
+                    self._wakeup.wait(self.flush_interval)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                batch_seq = self._submitted_seq - len(self._pending)
+                self._in_flight = batch
+                closed = self._closed
+            if batch:
+                self._write(batch)
+            with self._lock:
+                self._in_flight = []
+                self._done_seq = batch_seq
+                self._flushed.notify_all()
+            if closed and not batch and not self._pending:
+                return
+
+    def flush(self):
+        with self._lock:
+            seq = self._submitted_seq
+            self._wakeup.notify()
+            while self._done_seq < seq:
+                self._flushed.wait()
 
     def close(self):
-        if self.connection is not None:
-            self.connection.close()
-            print("Connection to MySQL database closed.")
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._writer.join()
@@ -0,0 +1,182 @@
+import argparse
+
+from db import ConnectionPool, mysql_connection_factory, sqlite_connection_factory
+from settings import load_settings
+
+# Ordered migrations, each a list of statements per dialect. Applied versions are recorded in schema_migrations.
+MIGRATIONS = [
+    (1, {
+        "mysql": [
+            """
+            CREATE TABLE IF NOT EXISTS user_comments (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                comment_text TEXT NOT NULL,
+                type VARCHAR(32) NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS category_summaries (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                category VARCHAR(32) NOT NULL,
+                summary MEDIUMTEXT
+            )
+            """,
+        ],
+        "sqlite": [
+            """
+            CREATE TABLE IF NOT EXISTS user_comments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                comment_text TEXT NOT NULL,
+                type VARCHAR(32) NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS category_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category VARCHAR(32) NOT NULL,
+                summary TEXT
+            )
+            """,
+        ],
+    }),
+    # The category feed filters on type and pages on (created_at, id), the All feed pages on (created_at, id). The
+    # comment text cannot be part of an index, so each page still reads its own rows but never sorts or scans.
+    (2, {
+        "mysql": [
+            "CREATE INDEX idx_user_comments_type_created ON user_comments (type, created_at, id)",
+            "CREATE INDEX idx_user_comments_created ON user_comments (created_at, id)",
+        ],
+        "sqlite": [
+            "CREATE INDEX idx_user_comments_type_created ON user_comments (type, created_at, id)",
+            "CREATE INDEX idx_user_comments_created ON user_comments (created_at, id)",
+        ],
+    }),
+    # One summary per category, older duplicates are dropped before the key is added
+    (3, {
+        "mysql": [
+            """
+            DELETE older FROM category_summaries older
+            JOIN category_summaries newer ON older.category = newer.category AND older.id < newer.id
+            """,
+            "CREATE UNIQUE INDEX uq_category_summaries_category ON category_summaries (category)",
+        ],
+        "sqlite": [
+            """
+            DELETE FROM category_summaries
+            WHERE id NOT IN (SELECT MAX(id) FROM category_summaries GROUP BY category)
+            """,
+            "CREATE UNIQUE INDEX uq_category_summaries_category ON category_summaries (category)",
+        ],
+    }),
+]
+
+MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+
+
+def migrate(pool: ConnectionPool):
+    # Returns the versions applied by this call
+    applied = []
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        if pool.dialect == "mysql":
+            # Replicas starting together must not run the same DDL twice
+            cursor.execute("SELECT GET_LOCK('comments_schema', 60)")
+            cursor.fetchone()
+        try:
+            cursor.execute(MIGRATIONS_TABLE)
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+            for version, statements in MIGRATIONS:
+                if version in done:
+                    continue
+                for statement in statements[pool.dialect]:
+                    cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                connection.commit()
+                applied.append(version)
+        finally:
+            if pool.dialect == "mysql":
+                cursor.execute("SELECT RELEASE_LOCK('comments_schema')")
+                cursor.fetchone()
+            cursor.close()
+    return applied
+
+
+def hot_queries(comments):
+    # The statements the app runs on every Suggestions rerun, with representative parameters
+    queries = {}
+    for name, category, after in (("category feed", "Consent", None),
+                                  ("category feed, next page", "Consent", ("2024-01-01 00:00:00", 1)),
+                                  ("all feed", "All", None)):
+        query, params = comments._page_query(category, after)
+        queries[name] = (query + " LIMIT %s", tuple(params) + (21,))
+    queries["category summary"] = ("SELECT summary FROM category_summaries WHERE category = %s", ("Consent",))
+    return queries
+
+
+def _plan_problems(dialect: str, description, rows):
+    problems = []
+    if dialect == "sqlite":
+        # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail)
+        for row in rows:
+            detail = row[3]
+            if "TEMP B-TREE" in detail:
+                problems.append(f"sorts without an index ({detail})")
+            elif detail.startswith("SCAN") and "USING" not in detail:
+                problems.append(f"full table scan ({detail})")
+        return problems
+    columns = [column[0].lower() for column in description]
+    for row in rows:
+        plan = dict(zip(columns, row))
+        extra = plan.get("extra") or ""
+        if plan.get("type") == "ALL":
+            problems.append(f"full table scan of {plan.get('table')}")
+        if "Using filesort" in extra:
+            problems.append(f"filesort on {plan.get('table')}")
+    return problems
+
+
+def check_query_plans(comments):
+    # EXPLAIN every hot query and return {query name: [problems]} for the ones that scan or sort
+    pool = comments.pool
+    explain = "EXPLAIN QUERY PLAN " if pool.dialect == "sqlite" else "EXPLAIN "
+    warnings = {}
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        for name, (query, params) in hot_queries(comments).items():
+            cursor.execute(explain + query, params)
+            problems = _plan_problems(pool.dialect, cursor.description, cursor.fetchall())
+            if problems:
+                warnings[name] = problems
+        cursor.close()
+    return warnings
+
+
+def main():
+    from comments import Comments
+
+    parser = argparse.ArgumentParser(description="Migrate the comments schema and check the hot query plans.")
+    parser.add_argument("--sqlite", help="Path of a SQLite database to use instead of the Cloud SQL instance")
+    args = parser.parse_args()
+    if args.sqlite:
+        pool = ConnectionPool(sqlite_connection_factory(args.sqlite), dialect="sqlite")
+    else:
+        pool = ConnectionPool(mysql_connection_factory(load_settings()))
+    print(f"Applied migrations: {migrate(pool) or 'none'}")
+    warnings = check_query_plans(Comments(pool))
+    for name, problems in warnings.items():
+        print(f"{name}: {'; '.join(problems)}")
+    if not warnings:
+        print("All hot queries use their indexes.")
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import time
+
+
+class ConsentEvent:
+    __slots__ = ("subject_id", "collection_point", "purpose", "elements", "granted", "timestamp")
+
+    def __init__(self, subject_id: str, collection_point: str, purpose: str, elements, granted: bool,
+                 timestamp: float = None):
+        self.subject_id = subject_id
+        self.collection_point = collection_point
+        self.purpose = purpose
+        self.elements = frozenset(elements)
+        self.granted = granted
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    def to_json(self):
+        return json.dumps([self.subject_id, self.collection_point, self.purpose, sorted(self.elements),
+                           self.granted, self.timestamp])
+
+    @classmethod
+    def from_json(cls, line: str):
+        return cls(*json.loads(line))
+
+
+class ConsentLedger:
+    def __init__(self, path: str, flush_interval: float = 0.05, max_batch: int = 10000,
+                 compact_after: int = 1000000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.compact_after = compact_after
+        self.stats = {"recorded": 0, "flushes": 0, "compactions": 0}
+
+        # Latest event per (subject, purpose), the log file is only read back on start up
+        self._latest = {}
+        # Subjects currently granting consent, per purpose
+        self._granted = {}
+        self._pending = []
+        self._appended = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        # Sequence of the last recorded event and of the last one known to be on disk
+        self._recorded_seq = 0
+        self._durable_seq = 0
+        self._closed = False
+
+        if os.path.exists(path):
+            self._replay(path)
+        self._log = open(path, "a", encoding="utf-8")
+        self._writer = threading.Thread(target=self._run, name="consent-ledger-writer", daemon=True)
+        self._writer.start()
+
+    def _replay(self, path: str):
+        with open(path, "rb") as log:
+            lines = log.readlines()
+        end = 0
+        for number, line in enumerate(lines, start=1):
+            try:
+                event = ConsentEvent.from_json(line.decode("utf-8")) if line.strip() else None
+            except ValueError:
+                if number < len(lines):
+                    raise ValueError(f"Consent ledger {path} is corrupt at line {number}.") from None
+                # A crash part way through a write leaves a torn last line, the event was never acknowledged
+                # as durable so it is dropped and the next append starts on a fresh line
+                with open(path, "r+b") as log:
+                    log.truncate(end)
+                return
+            if event is not None:
+                self._index(event)
+                self._appended += 1
+            end += len(line)
+        if lines and not lines[-1].endswith(b"\n"):
+            with open(path, "ab") as log:
+                log.write(b"\n")
+
+    def _index(self, event: ConsentEvent):
+        key = (event.subject_id, event.purpose)
+        current = self._latest.get(key)
+        if current is None or event.timestamp >= current.timestamp:
+            self._latest[key] = event
+            change = int(event.granted) - int(current is not None and current.granted)
+            if change:
+                count = self._granted.get(event.purpose, 0) + change
+                if count:
+                    self._granted[event.purpose] = count
+                else:
+                    del self._granted[event.purpose]
+
+    def record(self, event: ConsentEvent, durable: bool = False):
+        with self._lock:
+            if self._closed:
+                raise ValueError("Consent ledger is closed.")
+            self._index(event)
+            self._pending.append(event)
+            self._recorded_seq += 1
+            self.stats["recorded"] += 1
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+            if durable:
+                # Wait for the group commit that picks this event up
+                self._wait_durable(self._recorded_seq)
+
+    def _wait_durable(self, seq: int):
+        self._wakeup.notify()
+        while self._durable_seq < seq:
+            self._flushed.wait()
+
+    def may_process(self, subject_id: str, purpose: str, element: str = None):
+        event = self._latest.get((subject_id, purpose))
+        if event is None or not event.granted:
+            return False
+        return element is None or element in event.elements
+
+    def latest(self, subject_id: str, purpose: str):
+        return self._latest.get((subject_id, purpose))
+
+    def granted_purposes(self):
+        with self._lock:
+            return set(self._granted)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending and not self._closed:
+                    self._wakeup.wait(self.flush_interval)
+                batch, self._pending = self._pending, []
+                batch_seq = self._recorded_seq
+                closed = self._closed
+            if batch:
+                self._write(batch)
+            with self._lock:
+                self._durable_seq = batch_seq
+                self._flushed.notify_all()
+            if closed and not batch:
+                return
+            # Relative to the live events too, a log that is mostly live again right after compacting would
+            # otherwise be rewritten on every loop
+            if self._appended >= max(self.compact_after, 2 * len(self._latest)):
+                self.compact()
+
+    def _write(self, batch):
+        # One write and one fsync per batch, however many events it holds
+        with self._write_lock:
+            self._log.write("".join(event.to_json() + "\n" for event in batch))
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._appended += len(batch)
+            self.stats["flushes"] += 1
+
+    def compact(self):
+        # Rewrite the log with only the latest event per subject and purpose
+        with self._write_lock:
+            with self._lock:
+                latest = list(self._latest.values())
+            compacted_path = self.path + ".compact"
+            with open(compacted_path, "w", encoding="utf-8") as compacted:
+                compacted.write("".join(event.to_json() + "\n" for event in latest))
+                compacted.flush()
+                os.fsync(compacted.fileno())
+            self._log.close()
+            os.replace(compacted_path, self.path)
+            self._log = open(self.path, "a", encoding="utf-8")
+            self._appended = len(latest)
+            self.stats["compactions"] += 1
+
+    def flush(self):
+        with self._lock:
+            self._wait_durable(self._recorded_seq)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._writer.join()
+        self._log.close()
@@ -0,0 +1,177 @@
+import asyncio
+import re
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+import aiohttp
+
+from instrumentation import metrics
+
+# Known cookie names and script/cookie domains per vendor
+VENDOR_COOKIE_NAMES = {
+    "Google": ["_ga", "_gid", "_gat", "_gcl_au", "NID", "IDE", "1P_JAR", "__gads"],
+    "Meta": ["_fbp", "_fbc", "fr", "datr"],
+    "Microsoft": ["_clck", "_clsk", "MUID", "_uetsid", "_uetvid", "ANONCHK"],
+    "Salesforce": ["BrowserId", "sfdc-stream", "_evga", "pardot", "visitor_id"],
+}
+VENDOR_DOMAINS = {
+    "Google": ["google.com", "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+               "googlesyndication.com", "googleadservices.com", "gstatic.com"],
+    "Meta": ["facebook.com", "facebook.net", "fbcdn.net", "instagram.com"],
+    "Microsoft": ["clarity.ms", "bing.com", "microsoft.com", "live.com"],
+    "Salesforce": ["salesforce.com", "force.com", "pardot.com", "exacttarget.com", "krxd.net"],
+}
+
+
+def _compile_cookie_lookup(vendor_cookie_names):
+    # Longest names first so the alternation prefers the most specific name, "_ga" also matches "_ga_XYZ"
+    owners = {name: vendor for vendor, names in vendor_cookie_names.items() for name in names}
+    alternation = "|".join(re.escape(name) for name in sorted(owners, key=len, reverse=True))
+    pattern = re.compile(rf"({alternation})(?=$|[_\-])")
+    return owners, pattern
+
+
+def _compile_domain_lookup(vendor_domains):
+    return {domain: vendor for vendor, domains in vendor_domains.items() for domain in domains}
+
+
+COOKIE_OWNERS, COOKIE_PATTERN = _compile_cookie_lookup(VENDOR_COOKIE_NAMES)
+DOMAIN_OWNERS = _compile_domain_lookup(VENDOR_DOMAINS)
+
+SCRIPT_SRC = re.compile(rb"""<script\b[^>]*\bsrc\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+LINK_HREF = re.compile(rb"""<a\b[^>]*\bhref\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+
+
+def vendor_for_domain(domain: str):
+    # Walk the domain suffixes, "www.googletagmanager.com" -> "googletagmanager.com" -> "com"
+    labels = domain.lower().lstrip(".").split(".")
+    for i in range(len(labels) - 1):
+        vendor = DOMAIN_OWNERS.get(".".join(labels[i:]))
+        if vendor is not None:
+            return vendor
+    return None
+
+
+def vendor_for_cookie(name: str, domain: str = None):
+    if domain:
+        vendor = vendor_for_domain(domain)
+        if vendor is not None:
+            return vendor
+    match = COOKIE_PATTERN.match(name)
+    return COOKIE_OWNERS[match.group(1)] if match else None
+
+
+def _same_site(host: str, site: str):
+    return host == site or host.endswith("." + site)
+
+
+class ScanResult:
+    def __init__(self, site: str):
+        self.site = site
+        self.pages = 0
+        self.errors = 0
+        self.cookies = {}
+        self.script_hosts = set()
+        self.vendors = set()
+
+    def add_cookie(self, name: str, domain: str):
+        self.cookies[(name, domain)] = None
+        vendor = vendor_for_cookie(name, domain)
+        if vendor is not None:
+            self.vendors.add(vendor)
+
+    def add_script_host(self, host: str):
+        if _same_site(host, self.site):
+            return
+        self.script_hosts.add(host)
+        vendor = vendor_for_domain(host)
+        if vendor is not None:
+            self.vendors.add(vendor)
+
+
+class CookieScanner:
+    def __init__(self, max_pages: int = 200, connections_per_host: int = 8, workers: int = 32,
+                 timeout: float = 10.0, max_page_bytes: int = 2 * 1024 * 1024):
+        self.max_pages = max_pages
+        self.connections_per_host = connections_per_host
+        self.workers = workers
+        self.timeout = timeout
+        self.max_page_bytes = max_page_bytes
+
+    @metrics.timed("cookies.scan")
+    def scan(self, website: str):
+        return asyncio.run(self.scan_async(website))
+
+    async def scan_async(self, website: str):
+        start_url = website if "://" in website else f"https://{website}/"
+        site = urlsplit(start_url).hostname
+        result = ScanResult(site)
+        queue = asyncio.Queue()
+        seen = {start_url}
+        queue.put_nowait(start_url)
+
+        connector = aiohttp.TCPConnector(limit_per_host=self.connections_per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        # Cookies are read from the raw Set-Cookie headers, the session must not replay them
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         cookie_jar=aiohttp.DummyCookieJar()) as session:
+            async def worker():
+                while True:
+                    url = await queue.get()
+                    try:
+                        for link in await self._fetch(session, url, result):
+                            if link not in seen and len(seen) < self.max_pages:
+                                seen.add(link)
+                                queue.put_nowait(link)
+                    finally:
+                        queue.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.workers)]
+            await queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return result
+
+    async def _fetch(self, session, url: str, result: ScanResult):
+        try:
+            async with session.get(url) as response:
+                host = response.url.host
+                for header in response.headers.getall("Set-Cookie", ()):
+                    cookie = SimpleCookie()
+                    try:
+                        cookie.load(header)
+                    except CookieError:
+                        continue
+                    for name, morsel in cookie.items():
+                        result.add_cookie(name, morsel["domain"] or host)
+                if "html" not in response.headers.get("Content-Type", ""):
+                    result.pages += 1
+                    return []
+                # read(n) returns whatever is buffered, keep reading until the end of the page or the cap
+                chunks = []
+                remaining = self.max_page_bytes
+                while remaining > 0:
+                    chunk = await response.content.read(remaining)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    remaining -= len(chunk)
+                body = b"".join(chunks)
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeError):
+            result.errors += 1
+            return []
+        result.pages += 1
+
+        for src in SCRIPT_SRC.findall(body):
+            script_host = urlsplit(urljoin(url, src.decode(errors="ignore"))).hostname
+            if script_host:
+                result.add_script_host(script_host)
+
+        links = []
+        for href in LINK_HREF.findall(body):
+            link = urldefrag(urljoin(url, href.decode(errors="ignore")))[0]
+            parts = urlsplit(link)
+            if parts.scheme in ("http", "https") and parts.hostname and _same_site(parts.hostname, result.site):
+                links.append(link)
+        return links
@@ -0,0 +1,217 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from instrumentation import metrics
+
+# Anchored per line so a sampled column is matched in one pass over its joined values, patterns must not cross \n
+PII_PATTERNS = {
+    "Email": re.compile(r"^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$", re.MULTILINE),
+    "SSN": re.compile(r"^(?!000|666|9\d\d)\d{3}-?(?!00)\d{2}-?(?!0000)\d{4}$", re.MULTILINE),
+    "Phone Number": re.compile(r"^(?:\+?\d{1,3}[ .-]?)?\(?\d{3}\)?[ .-]?\d{3}[ .-]?\d{4}$", re.MULTILINE),
+    "Address": re.compile(
+        r"^\d{1,6}[ \t]+(?:[A-Za-z0-9.'-]+[ \t]+){1,5}"
+        r"(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Way|Place|Pl|Terrace|Ter)\b.*$",
+        re.MULTILINE | re.IGNORECASE),
+    "Name": re.compile(r"^[A-Z][a-z]+(?:[ '-][A-Z][a-z]+){0,3}$", re.MULTILINE),
+}
+# Column headers that point at a type, used to accept a weaker value signal
+HEADER_HINTS = {
+    "Email": re.compile(r"e-?mail", re.IGNORECASE),
+    "SSN": re.compile(r"ssn|social.?security", re.IGNORECASE),
+    "Phone Number": re.compile(r"phone|mobile|cell|tel", re.IGNORECASE),
+    "Address": re.compile(r"address|street|addr", re.IGNORECASE),
+    "Name": re.compile(r"name", re.IGNORECASE),
+}
+# Capitalised words are too common to call a column names without a matching header
+HINT_REQUIRED = {"Name"}
+# SSNs written without dashes also look like phone numbers, the more specific type wins ties
+TYPE_PRIORITY = ["Email", "SSN", "Phone Number", "Address", "Name"]
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+
+
+def detect_format(path: str):
+    file_format = FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Unsupported data source format: {path}")
+    return file_format
+
+
+def list_sources(directory: str):
+    # Files under the data directory that can be scanned, relative to it
+    sources = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in FORMATS:
+                sources.append(os.path.relpath(os.path.join(root, name), directory))
+    return sorted(sources)
+
+
+def classify_values(values):
+    block = "\n".join(value.replace("\n", " ").strip() for value in values)
+    return {pii_type: len(pattern.findall(block)) for pii_type, pattern in PII_PATTERNS.items()}
+
+
+def _merge(column_stats, chunk_stats):
+    for column, (samples, counts) in chunk_stats.items():
+        stats = column_stats.setdefault(column, [0, dict.fromkeys(PII_PATTERNS, 0)])
+        stats[0] += samples
+        for pii_type, count in counts.items():
+            stats[1][pii_type] += count
+
+
+def _sample_columns(columns, rows):
+    values = {column: [] for column in columns}
+    for row in rows:
+        for column in columns:
+            value = row.get(column)
+            if value not in (None, ""):
+                values[column].append(str(value))
+    return {column: (len(column_values), classify_values(column_values))
+            for column, column_values in values.items() if column_values}
+
+
+def _read_lines(path: str, start: int, end: int, max_rows: int):
+    with open(path, "rb") as source:
+        if start:
+            # A range starting mid-line skips the partial line, it belongs to the previous range
+            source.seek(start - 1)
+            if source.read(1) != b"\n":
+                source.readline()
+        lines = []
+        while len(lines) < max_rows and source.tell() < end:
+            line = source.readline()
+            if not line:
+                break
+            lines.append(line.decode("utf-8", errors="replace"))
+        return lines
+
+
+def _scan_csv_range(path: str, header, start: int, end: int, max_rows: int):
+    # Ranges are cut on line boundaries, quoted fields spanning lines are not supported
+    lines = _read_lines(path, start, end, max_rows)
+    rows = csv.DictReader(io.StringIO("".join(lines)), fieldnames=header)
+    return _sample_columns(header, rows)
+
+
+def _scan_jsonl_range(path: str, start: int, end: int, max_rows: int):
+    rows = []
+    for line in _read_lines(path, start, end, max_rows):
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(row, dict):
+            rows.append(row)
+    columns = list({column: None for row in rows for column in row})
+    return _sample_columns(columns, rows)
+
+
+def _scan_parquet_row_group(path: str, row_group: int, max_rows: int):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    batch = next(parquet_file.iter_batches(batch_size=max_rows, row_groups=[row_group]), None)
+    if batch is None:
+        return {}
+    stats = {}
+    for column, array in zip(batch.schema.names, batch.columns):
+        values = [str(value) for value in array.to_pylist() if value not in (None, "")]
+        if values:
+            stats[column] = (len(values), classify_values(values))
+    return stats
+
+
+class DataDiscovery:
+    def __init__(self, threshold: float = 0.8, min_samples: int = 200, rows_per_chunk: int = 1000,
+                 chunk_bytes: int = 64 * 1024 * 1024, max_workers: int = None):
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.rows_per_chunk = rows_per_chunk
+        self.chunk_bytes = chunk_bytes
+        self.max_workers = max_workers or os.cpu_count()
+
+    def _tasks(self, path: str, file_format: str):
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            row_groups = pq.ParquetFile(path).num_row_groups
+            return [(_scan_parquet_row_group, (path, row_group, self.rows_per_chunk))
+                    for row_group in range(row_groups)]
+        size = os.path.getsize(path)
+        start = 0
+        args = ()
+        if file_format == "csv":
+            with open(path, newline="", encoding="utf-8", errors="replace") as source:
+                header = next(csv.reader(source), [])
+            args = (header,)
+            with open(path, "rb") as source:
+                source.readline()
+                start = source.tell()
+        scan = _scan_csv_range if file_format == "csv" else _scan_jsonl_range
+        return [(scan, (path, *args, offset, min(offset + self.chunk_bytes, size), self.rows_per_chunk))
+                for offset in range(start, size, self.chunk_bytes)]
+
+    def _confidence(self, column: str, samples: int, counts):
+        best_type, best_ratio = None, 0.0
+        for pii_type in TYPE_PRIORITY:
+            hinted = HEADER_HINTS[pii_type].search(column) is not None
+            if pii_type in HINT_REQUIRED and not hinted:
+                continue
+            ratio = counts[pii_type] / samples
+            if hinted:
+                # A matching header lets a noisier column through
+                ratio = min(1.0, ratio * 1.5)
+            if ratio > best_ratio:
+                best_type, best_ratio = pii_type, ratio
+        return best_type, best_ratio
+
+    def _decided(self, column_stats):
+        for column, (samples, counts) in column_stats.items():
+            if samples < self.min_samples:
+                return False
+            _, ratio = self._confidence(column, samples, counts)
+            if self.threshold / 2 <= ratio < self.threshold:
+                return False
+        return True
+
+    @metrics.timed("data_discovery.scan")
+    def discover_columns(self, path: str):
+        tasks = self._tasks(path, detect_format(path))
+        column_stats = {}
+        if len(tasks) <= 1:
+            for scan, args in tasks:
+                _merge(column_stats, scan(*args))
+        else:
+            # Chunks are sampled in parallel across the file, stop as soon as every column is confidently classified
+            # Spawned rather than forked, the Streamlit server process is multi-threaded
+            with ProcessPoolExecutor(max_workers=self.max_workers,
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                pending_tasks = iter(tasks)
+                running = {executor.submit(scan, *args) for scan, args in
+                           (task for _, task in zip(range(self.max_workers), pending_tasks))}
+                while running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _merge(column_stats, future.result())
+                    if column_stats and self._decided(column_stats):
+                        for future in running:
+                            future.cancel()
+                        break
+                    for scan, args in (task for _, task in zip(range(len(done)), pending_tasks)):
+                        running.add(executor.submit(scan, *args))
+
+        discovered = {}
+        for column, (samples, counts) in column_stats.items():
+            pii_type, ratio = self._confidence(column, samples, counts)
+            if pii_type is not None and ratio >= self.threshold:
+                discovered[column] = pii_type
+        return discovered
+
+    def discover(self, path: str):
+        return sorted(set(self.discover_columns(path).values()), key=TYPE_PRIORITY.index)
@@ -0,0 +1,207 @@
+PROCESSING_ACTIVITY = "processing_activity"
+ASSET = "asset"
+DATA_ELEMENT = "data_element"
+VENDOR = "vendor"
+MODEL = "model"
+
+NODE_KINDS = (PROCESSING_ACTIVITY, ASSET, DATA_ELEMENT, VENDOR, MODEL)
+
+NODE_CHANGE = "node"
+EDGE_CHANGE = "edge"
+ATTRS_CHANGE = "attrs"
+
+MAX_JOURNAL = 10000
+
+
+class Node:
+    __slots__ = ("name", "kind", "label", "attrs")
+
+    def __init__(self, name: str, kind: str, label: str = None, attrs: dict = None):
+        self.name = name
+        self.kind = kind
+        self.label = label if label is not None else name
+        self.attrs = attrs if attrs is not None else {}
+
+    def __repr__(self):
+        return f"Node({self.name!r}, {self.kind!r})"
+
+
+def element_node_name(owner: str, element: str):
+    return f"{owner}_{element}"
+
+
+class DataMap:
+    def __init__(self):
+        # Dicts double as insertion-ordered sets so renders stay stable between reruns
+        self._nodes = {}
+        self._by_kind = {kind: {} for kind in NODE_KINDS}
+        self._edges = {}
+        self._out = {}
+        self._in = {}
+        self._elements = {}
+        self._element_owners = {}
+        # Every structural change bumps the version and is journaled so views can update incrementally
+        self.version = 0
+        self._journal = []
+        self._journal_start = 0
+
+    @classmethod
+    def from_records(cls, nodes, edges):
+        # Bulk load that bypasses per-insert bookkeeping, nodes are (name, kind, label, attrs) and edges (source, target)
+        data_map = cls()
+        node_index = data_map._nodes
+        by_kind = data_map._by_kind
+        for name, kind, label, attrs in nodes:
+            node = Node(name, kind, label, dict(attrs))
+            node_index[name] = node
+            by_kind[kind][name] = node
+            if kind == DATA_ELEMENT:
+                owner, element = attrs["owner"], attrs["element"]
+                data_map._elements.setdefault(owner, {})[element] = None
+                data_map._element_owners.setdefault(element, {})[owner] = None
+        data_map._out = {name: {} for name in node_index}
+        data_map._in = {name: {} for name in node_index}
+        # Edges whose endpoints are missing are dropped rather than failing the whole load
+        data_map._edges = dict.fromkeys(edge for edge in edges if edge[0] in node_index and edge[1] in node_index)
+        for source, target in data_map._edges:
+            data_map._out[source][target] = None
+            data_map._in[target][source] = None
+        # Nothing to replay, views start with a full build
+        data_map.version = data_map._journal_start = 1
+        return data_map
+
+    def replace(self, other: "DataMap"):
+        # Take over the contents of other in place, views bound to this map see a journal gap and rebuild
+        self._nodes, self._by_kind, self._edges = other._nodes, other._by_kind, other._edges
+        self._out, self._in = other._out, other._in
+        self._elements, self._element_owners = other._elements, other._element_owners
+        self.version += 1
+        self._journal = []
+        self._journal_start = self.version
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, name):
+        return name in self._nodes
+
+    def _record(self, change: str, key, added: bool):
+        self._journal.append((change, key, added))
+        self.version += 1
+        if len(self._journal) > MAX_JOURNAL:
+            dropped = len(self._journal) - MAX_JOURNAL // 2
+            del self._journal[:dropped]
+            self._journal_start += dropped
+
+    def changes_since(self, version: int):
+        # None means the journal no longer reaches back that far and the caller has to rebuild
+        if version < self._journal_start:
+            return None
+        return self._journal[version - self._journal_start:]
+
+    def node(self, name: str):
+        return self._nodes.get(name)
+
+    def nodes(self, kind: str = None):
+        if kind is None:
+            return list(self._nodes.values())
+        return list(self._by_kind[kind].values())
+
+    def names(self, kind: str):
+        return list(self._by_kind[kind])
+
+    def add_node(self, name: str, kind: str, label: str = None, **attrs):
+        node = self._nodes.get(name)
+        if node is None:
+            node = Node(name, kind, label, attrs)
+            self._nodes[name] = node
+            self._by_kind[kind][name] = node
+            self._out[name] = {}
+            self._in[name] = {}
+            self._record(NODE_CHANGE, name, True)
+        elif attrs:
+            node.attrs.update(attrs)
+            self._record(ATTRS_CHANGE, name, True)
+        return node
+
+    def add_edge(self, source: str, target: str):
+        edge = (source, target)
+        if edge in self._edges:
+            return False
+        for name in edge:
+            if name not in self._nodes:
+                raise KeyError(f"Unknown data map node '{name}'.")
+        self._edges[edge] = None
+        self._out[source][target] = None
+        self._in[target][source] = None
+        self._record(EDGE_CHANGE, edge, True)
+        return True
+
+    def remove_edge(self, source: str, target: str):
+        edge = (source, target)
+        if edge not in self._edges:
+            return False
+        del self._edges[edge]
+        del self._out[source][target]
+        del self._in[target][source]
+        self._record(EDGE_CHANGE, edge, False)
+        return True
+
+    def remove_node(self, name: str):
+        node = self._nodes.pop(name, None)
+        if node is None:
+            return False
+        if node.kind == DATA_ELEMENT:
+            owner, element = node.attrs["owner"], node.attrs["element"]
+            self._elements[owner].pop(element, None)
+            self._element_owners[element].pop(owner, None)
+        for element in list(self._elements.get(name, ())):
+            self.remove_node(element_node_name(name, element))
+        self._elements.pop(name, None)
+        for target in list(self._out[name]):
+            self.remove_edge(name, target)
+        for source in list(self._in[name]):
+            self.remove_edge(source, name)
+        del self._by_kind[node.kind][name]
+        del self._out[name]
+        del self._in[name]
+        self._record(NODE_CHANGE, name, False)
+        return True
+
+    def has_edge(self, source: str, target: str):
+        return (source, target) in self._edges
+
+    def edges(self):
+        return list(self._edges)
+
+    def successors(self, name: str):
+        return list(self._out.get(name, ()))
+
+    def predecessors(self, name: str):
+        return list(self._in.get(name, ()))
+
+    def elements(self, owner: str):
+        return list(self._elements.get(owner, ()))
+
+    def element_owners(self, element: str):
+        return list(self._element_owners.get(element, ()))
+
+    def add_elements(self, owner: str, elements):
+        owned = self._elements.setdefault(owner, {})
+        added = []
+        for element in elements:
+            if element in owned:
+                continue
+            element_node = element_node_name(owner, element)
+            self.add_node(element_node, DATA_ELEMENT, label=element, owner=owner, element=element)
+            self.add_edge(owner, element_node)
+            owned[element] = None
+            self._element_owners.setdefault(element, {})[owner] = None
+            added.append(element)
+        return added
+
+    def set_elements(self, owner: str, elements):
+        owned = self._elements.get(owner, {})
+        for element in [element for element in owned if element not in elements]:
+            self.remove_node(element_node_name(owner, element))
+        return self.add_elements(owner, elements)
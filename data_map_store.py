@@ -0,0 +1,269 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from data_map import ATTRS_CHANGE, DATA_ELEMENT, EDGE_CHANGE, NODE_CHANGE, DataMap
+from db import ConnectionPool
+from instrumentation import metrics
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS data_map_head (
+        id INT PRIMARY KEY,
+        seq BIGINT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS data_map_nodes (
+        name VARCHAR(255) PRIMARY KEY,
+        kind VARCHAR(32) NOT NULL,
+        label VARCHAR(255),
+        attrs TEXT,
+        seq BIGINT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS data_map_edges (
+        source VARCHAR(255) NOT NULL,
+        target VARCHAR(255) NOT NULL,
+        seq BIGINT NOT NULL,
+        PRIMARY KEY (source, target)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS data_map_changes (
+        seq BIGINT PRIMARY KEY,
+        change_type VARCHAR(8) NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        target VARCHAR(255),
+        present SMALLINT NOT NULL,
+        kind VARCHAR(32),
+        label VARCHAR(255),
+        attrs TEXT
+    )
+    """,
+]
+
+
+class ConflictError(Exception):
+    pass
+
+
+class DataMapStore:
+    def __init__(self, pool: ConnectionPool, batch_size: int = 1000):
+        self.pool = pool
+        self.batch_size = batch_size
+
+    def _upsert(self, table: str, columns, keys):
+        placeholders = ", ".join(["%s"] * len(columns))
+        updates = [column for column in columns if column not in keys]
+        if self.pool.dialect == "sqlite":
+            assignments = ", ".join(f"{column} = excluded.{column}" for column in updates)
+            conflict = f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {assignments}"
+        else:
+            assignments = ", ".join(f"{column} = VALUES({column})" for column in updates)
+            conflict = f"ON DUPLICATE KEY UPDATE {assignments}"
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) {conflict}"
+
+    def _executemany(self, cursor, query: str, rows):
+        for start in range(0, len(rows), self.batch_size):
+            cursor.executemany(query, rows[start:start + self.batch_size])
+
+    def create_schema(self):
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            for statement in SCHEMA:
+                cursor.execute(statement)
+            cursor.execute("SELECT seq FROM data_map_head WHERE id = 1")
+            if cursor.fetchone() is None:
+                cursor.execute("INSERT INTO data_map_head (id, seq) VALUES (1, 0)")
+            connection.commit()
+            cursor.close()
+
+    @metrics.timed("data_map_store.load")
+    def load(self):
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT seq FROM data_map_head WHERE id = 1")
+            seq = cursor.fetchone()[0]
+            cursor.execute("SELECT name, kind, label, attrs FROM data_map_nodes")
+            nodes = [(name, kind, label, json.loads(attrs) if attrs else {})
+                     for name, kind, label, attrs in cursor.fetchall()]
+            cursor.execute("SELECT source, target FROM data_map_edges")
+            edges = [tuple(edge) for edge in cursor.fetchall()]
+            cursor.close()
+        return DataMap.from_records(nodes, edges), seq
+
+    @metrics.timed("data_map_store.changes_since")
+    def changes_since(self, seq: int, limit: int = 5000):
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT seq, change_type, name, target, present, kind, label, attrs FROM data_map_changes
+                WHERE seq > %s
+                ORDER BY seq
+                LIMIT %s
+                """,
+                (seq, limit)
+            )
+            changes = cursor.fetchall()
+            cursor.close()
+        return changes
+
+    @metrics.timed("data_map_store.write")
+    def write(self, data_map: DataMap, touched, expected_seq: int):
+        # touched is an ordered collection of (change_type, key); the current state of each key in data_map is
+        # written with one batched statement per table, guarded by a compare-and-set on the head sequence
+        changes, node_upserts, node_deletes, edge_upserts, edge_deletes = [], [], [], [], []
+        seq = expected_seq
+        for change_type, key in touched:
+            seq += 1
+            if change_type == NODE_CHANGE:
+                node = data_map.node(key)
+                if node is None:
+                    node_deletes.append((key,))
+                    changes.append((seq, NODE_CHANGE, key, None, 0, None, None, None))
+                else:
+                    attrs = json.dumps(node.attrs) if node.attrs else None
+                    node_upserts.append((node.name, node.kind, node.label, attrs, seq))
+                    changes.append((seq, NODE_CHANGE, key, None, 1, node.kind, node.label, attrs))
+            else:
+                source, target = key
+                if data_map.has_edge(source, target):
+                    edge_upserts.append((source, target, seq))
+                else:
+                    edge_deletes.append((source, target))
+                changes.append((seq, EDGE_CHANGE, source, target, int(data_map.has_edge(source, target)),
+                                None, None, None))
+        if not changes:
+            return expected_seq
+
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("UPDATE data_map_head SET seq = %s WHERE id = 1 AND seq = %s", (seq, expected_seq))
+            if cursor.rowcount != 1:
+                connection.rollback()
+                cursor.close()
+                raise ConflictError(f"Data map changed since sequence {expected_seq}.")
+            if node_deletes:
+                # Links to a deleted node may have been written by a replica this one never caught up with, they
+                # are deleted and logged too so the stored edges never refer to a missing node
+                deleted = set(edge_deletes)
+                for (name,) in node_deletes:
+                    cursor.execute("SELECT source, target FROM data_map_edges WHERE source = %s OR target = %s",
+                                   (name, name))
+                    for source, target in cursor.fetchall():
+                        if (source, target) not in deleted:
+                            deleted.add((source, target))
+                            seq += 1
+                            edge_deletes.append((source, target))
+                            changes.append((seq, EDGE_CHANGE, source, target, 0, None, None, None))
+                cursor.execute("UPDATE data_map_head SET seq = %s WHERE id = 1", (seq,))
+            self._executemany(cursor, """
+                INSERT INTO data_map_changes (seq, change_type, name, target, present, kind, label, attrs)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, changes)
+            self._executemany(cursor, self._upsert("data_map_nodes", ("name", "kind", "label", "attrs", "seq"),
+                                                   ("name",)), node_upserts)
+            self._executemany(cursor, "DELETE FROM data_map_nodes WHERE name = %s", node_deletes)
+            self._executemany(cursor, self._upsert("data_map_edges", ("source", "target", "seq"),
+                                                   ("source", "target")), edge_upserts)
+            self._executemany(cursor, "DELETE FROM data_map_edges WHERE source = %s AND target = %s", edge_deletes)
+            connection.commit()
+            cursor.close()
+        return seq
+
+
+def touched_keys(changes):
+    # Collapse journal entries into the distinct nodes and edges they touched, in first-touch order
+    touched = {}
+    for change_type, key, _ in changes:
+        if change_type == ATTRS_CHANGE:
+            change_type = NODE_CHANGE
+        touched[(change_type, key)] = None
+    return list(touched)
+
+
+def apply_change(data_map: DataMap, change):
+    _, change_type, name, target, present, kind, label, attrs = change
+    if change_type == EDGE_CHANGE:
+        if present:
+            if name in data_map and target in data_map:
+                data_map.add_edge(name, target)
+        else:
+            data_map.remove_edge(name, target)
+    elif not present:
+        data_map.remove_node(name)
+    else:
+        attrs = json.loads(attrs) if attrs else {}
+        if kind == DATA_ELEMENT:
+            if attrs["owner"] in data_map:
+                data_map.add_elements(attrs["owner"], [attrs["element"]])
+        else:
+            data_map.add_node(name, kind, label, **attrs)
+
+
+class DataMapReplica:
+    def __init__(self, store: DataMapStore, poll_interval: float = 2.0, max_retries: int = 3):
+        self.store = store
+        self.poll_interval = poll_interval
+        self.max_retries = max_retries
+        # Guards the shared map against concurrent sessions, reentrant so an edit can pull remote changes
+        self.lock = threading.RLock()
+        self.data_map, self.seq = store.load()
+        self._polled_at = time.monotonic()
+
+    def _pull(self):
+        while True:
+            changes = self.store.changes_since(self.seq)
+            for change in changes:
+                apply_change(self.data_map, change)
+                self.seq = change[0]
+            if not changes:
+                break
+        self._polled_at = time.monotonic()
+
+    def refresh(self, force: bool = False):
+        if not force and time.monotonic() - self._polled_at < self.poll_interval:
+            return self.data_map
+        with self.lock:
+            self._pull()
+        return self.data_map
+
+    @contextmanager
+    def edit(self):
+        with self.lock:
+            self._pull()
+            start = self.data_map.version
+            try:
+                yield self.data_map
+            except BaseException:
+                # Nothing of a failed edit is stored, and the partial edits are dropped from the local map too
+                self._reload()
+                raise
+            changes = self.data_map.changes_since(start)
+            if changes is None:
+                # The edit outgrew the journal, write out the whole map
+                changes = [(NODE_CHANGE, node.name, True) for node in self.data_map.nodes()]
+                changes += [(EDGE_CHANGE, edge, True) for edge in self.data_map.edges()]
+            self._write(touched_keys(changes))
+
+    def _reload(self):
+        data_map, self.seq = self.store.load()
+        self.data_map.replace(data_map)
+        self._polled_at = time.monotonic()
+
+    def _write(self, touched):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.seq = self.store.write(self.data_map, touched, self.seq)
+                return
+            except ConflictError:
+                if attempt == self.max_retries:
+                    # Give up on the edit, the local map must not keep changes the store never saw
+                    self._reload()
+                    raise
+                # Another replica wrote first, fold its changes in and write our final state on top
+                self._pull()
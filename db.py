@@ -0,0 +1,190 @@
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from instrumentation import metrics
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    def __init__(self, factory, max_size: int = 5, max_idle: float = 300.0, max_lifetime: float = 1800.0,
+                 health_check_after: float = 30.0, checkout_timeout: float = 10.0, dialect: str = "mysql"):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        self.dialect = dialect
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"created": 0, "reused": 0, "recycled": 0, "evicted": 0, "failed_checks": 0}
+
+    def _is_expired(self, pooled: _PooledConnection, now: float):
+        if now - pooled.created_at > self.max_lifetime:
+            self.stats["recycled"] += 1
+            return True
+        if now - pooled.last_used > self.max_idle:
+            self.stats["evicted"] += 1
+            return True
+        return False
+
+    def _is_healthy(self, pooled: _PooledConnection, now: float):
+        if now - pooled.last_used < self.health_check_after:
+            return True
+        try:
+            ping = getattr(pooled.raw, "ping", None)
+            if ping is not None:
+                ping(reconnect=False)
+            else:
+                cursor = pooled.raw.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+            return True
+        except Exception:
+            self.stats["failed_checks"] += 1
+            return False
+
+    def _discard(self, pooled: _PooledConnection):
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+
+    def checkout(self):
+        if self._closed:
+            raise PoolExhausted("Connection pool is closed.")
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolExhausted(f"No connection available within {self.checkout_timeout}s.")
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                now = time.monotonic()
+                if self._is_expired(pooled, now) or not self._is_healthy(pooled, now):
+                    self._discard(pooled)
+                    continue
+                self.stats["reused"] += 1
+                metrics.count("db.connections_reused")
+                return pooled
+            pooled = _PooledConnection(self.factory())
+            self.stats["created"] += 1
+            metrics.count("db.connections_created")
+            return pooled
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def checkin(self, pooled: _PooledConnection, broken: bool = False):
+        try:
+            if broken or self._closed:
+                self._discard(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.put(pooled)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        with metrics.span("db.checkout"):
+            pooled = self.checkout()
+        broken = False
+        try:
+            yield pooled.raw
+        finally:
+            # Always end the transaction, a connection that only read would otherwise keep its REPEATABLE READ
+            # snapshot into the next checkout. Runs on GeneratorExit and Streamlit's rerun exceptions too, so the
+            # slot is never leaked.
+            try:
+                pooled.raw.rollback()
+            except Exception:
+                broken = True
+            self.checkin(pooled, broken=broken)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def mysql_connection_factory(settings):
+    from google.cloud.sql.connector import Connector
+
+    # One connector per process, it owns the refresh of the instance certificates. The credentials are handed over
+    # in memory, nothing is written to disk or to the environment.
+    connector = Connector(credentials=settings.credentials())
+
+    def connect():
+        return connector.connect(
+            settings.instance_connection_name,
+            "pymysql",
+            user=settings.username,
+            password=settings.password,
+            db=settings.database,
+        )
+
+    return connect
+
+
+_PARAM = re.compile(r"%s")
+
+
+class _SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        if isinstance(params, str):
+            params = (params,)
+        return self._cursor.execute(_PARAM.sub("?", query), params)
+
+    def executemany(self, query, seq_of_params):
+        return self._cursor.executemany(_PARAM.sub("?", query), seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _SQLiteConnection:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        return _SQLiteCursor(self._connection.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def sqlite_connection_factory(database: str):
+    # Local stand-in for the Cloud SQL instance, accepts the same %s placeholders
+    def connect():
+        return _SQLiteConnection(sqlite3.connect(database, check_same_thread=False, uri=True))
+
+    return connect
@@ -0,0 +1,135 @@
+import hashlib
+import io
+import json
+import re
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from data_map import ASSET, DataMap
+from instrumentation import metrics
+
+
+class AssetTimeout(Exception):
+    pass
+
+
+def resolve_assets(data_map: DataMap, elements):
+    # Walk the element -> owner index instead of scanning every asset
+    assets = {}
+    for element in elements:
+        for owner in data_map.element_owners(element):
+            node = data_map.node(owner)
+            if node is not None and node.kind == ASSET:
+                assets.setdefault(owner, []).append(element)
+    return assets
+
+
+def locate_elements(asset: str, elements, subject_id: str, timeout: float):
+    # Assets carry no connection details yet, so the default job only reports where each element lives
+    return {"asset": asset, "subject_id": subject_id, "elements": {element: None for element in elements}}
+
+
+def archive_name(asset: str):
+    # Asset names are typed in by users, only a plain file name goes into the package. A changed name gets a
+    # short hash of the original so two assets never share a file.
+    name = re.sub(r"[^\w.-]", "_", asset).strip("._") or "asset"
+    if name != asset:
+        name += "-" + hashlib.sha1(asset.encode()).hexdigest()[:8]
+    return f"assets/{name}.json"
+
+
+class AssetResult:
+    __slots__ = ("asset", "elements", "status", "attempts", "seconds", "error")
+
+    def __init__(self, asset: str, elements):
+        self.asset = asset
+        self.elements = elements
+        self.status = "pending"
+        self.attempts = 0
+        self.seconds = 0.0
+        self.error = None
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class DsarEngine:
+    def __init__(self, job=locate_elements, max_workers: int = 16, timeout: float = 30.0, retries: int = 2,
+                 backoff: float = 0.5):
+        self.job = job
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def _attempt(self, started: list, delay: float, asset: str, elements, subject_id: str):
+        if delay:
+            time.sleep(delay)
+        # The deadline runs from here, not from submission, jobs queued behind busy workers have not started yet
+        started.append(time.monotonic())
+        return self.job(asset, elements, subject_id, self.timeout)
+
+    @metrics.timed("dsar.fulfil")
+    def fulfil(self, assets, request_type: str, subject_id: str, elements, progress=None):
+        # assets maps each asset to the requested elements it holds, see resolve_assets
+        results = {asset: AssetResult(asset, asset_elements) for asset, asset_elements in assets.items()}
+        package = io.BytesIO()
+        # Not used as a context manager, shutting down must not wait on jobs that were abandoned after a timeout
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        with zipfile.ZipFile(package, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            running = {}
+
+            def submit(result: AssetResult, delay: float = 0.0):
+                result.attempts += 1
+                started = []
+                future = executor.submit(self._attempt, started, delay, result.asset, result.elements, subject_id)
+                running[future] = (result, started)
+
+            try:
+                for result in results.values():
+                    submit(result)
+                finished = 0
+                while running:
+                    now = time.monotonic()
+                    # A job that starts while waiting has its deadline at least a timeout away
+                    deadline = min((started[0] for _, started in running.values() if started),
+                                   default=now) + self.timeout
+                    done, _ = wait(running, timeout=max(0.0, deadline - now), return_when=FIRST_COMPLETED)
+                    now = time.monotonic()
+                    # Jobs past their deadline are abandoned, a thread cannot be interrupted so the job gets the
+                    # timeout too and is expected to give up on its own
+                    expired = [future for future, (_, started) in running.items()
+                               if future not in done and started and now - started[0] >= self.timeout]
+                    for future in [*done, *expired]:
+                        result, started = running.pop(future)
+                        result.seconds += now - started[0] if started else 0.0
+                        try:
+                            if future in expired:
+                                future.cancel()
+                                raise AssetTimeout(f"No response from {result.asset} within {self.timeout}s.")
+                            payload = future.result()
+                        except Exception as e:
+                            result.error = str(e)
+                            if result.attempts <= self.retries:
+                                submit(result, delay=self.backoff * result.attempts)
+                                continue
+                            result.status = "failed"
+                        else:
+                            result.status = "exported"
+                            result.error = None
+                            # Stream each asset into the package as soon as it completes
+                            archive.writestr(archive_name(result.asset), json.dumps(payload, default=str, indent=2))
+                        finished += 1
+                        if progress is not None:
+                            progress(finished, len(results), result)
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+            archive.writestr("manifest.json", json.dumps({
+                "request_type": request_type,
+                "subject_id": subject_id,
+                "elements": list(elements),
+                "assets": [{**result.as_dict(), "file": archive_name(result.asset)} if result.status == "exported"
+                           else result.as_dict() for result in results.values()],
+            }, indent=2))
+        return list(results.values()), package.getvalue()
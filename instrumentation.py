@@ -0,0 +1,142 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class _Disabled:
+    # Shared no-op span, entering it costs one attribute lookup and two calls
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+class _SpanStats:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        for position, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[position] += 1
+                break
+
+
+class Instrumentation:
+    def __init__(self, enabled: bool = False):
+        # Records on every thread when enabled, otherwise only on a thread between start_trace and end_trace
+        self.enabled = enabled
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        # Spans of the trace running on this thread, a Streamlit rerun runs on one thread
+        self._local = threading.local()
+
+    def span(self, name: str):
+        if not self.enabled and getattr(self._local, "trace", None) is None:
+            return _DISABLED
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str):
+        trace = getattr(self._local, "trace", None)
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._local.depth = depth
+            with self._lock:
+                stats = self._spans.get(name)
+                if stats is None:
+                    stats = self._spans[name] = _SpanStats()
+                stats.add(seconds)
+            if trace is not None:
+                trace.append((name, depth, started, seconds))
+
+    def timed(self, name: str = None):
+        def decorator(func):
+            span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled and getattr(self._local, "trace", None) is None:
+                    return func(*args, **kwargs)
+                with self._span(span_name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count(self, name: str, value: float = 1):
+        if not self.enabled and getattr(self._local, "trace", None) is None:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def start_trace(self):
+        self._local.trace = []
+        self._local.depth = 0
+
+    def end_trace(self):
+        # Spans recorded on this thread since start_trace, in start order as (name, depth, seconds)
+        trace = getattr(self._local, "trace", None) or []
+        self._local.trace = None
+        return [(name, depth, seconds) for name, depth, _, seconds in sorted(trace, key=lambda span: span[2])]
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            spans = {name: {"count": stats.count, "total_seconds": stats.total, "max_seconds": stats.max,
+                            "buckets": dict(zip(map(str, BUCKETS), stats.buckets))}
+                     for name, stats in self._spans.items()}
+            counters = dict(self._counters)
+        return {"spans": spans, "counters": counters}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "platform"):
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {prefix}_span_seconds histogram"]
+        for name, stats in sorted(snapshot["spans"].items()):
+            cumulative = 0
+            for bound, count in stats["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(f'{prefix}_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_span_seconds_sum{{span="{name}"}} {stats["total_seconds"]}')
+            lines.append(f'{prefix}_span_seconds_count{{span="{name}"}} {stats["count"]}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide instance the modules report to, switched on from the app
+metrics = Instrumentation()
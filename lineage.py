@@ -0,0 +1,176 @@
+import time
+from collections import deque
+
+from data_map import EDGE_CHANGE, NODE_CHANGE, DataMap
+from instrumentation import metrics
+
+
+class LineageIndex:
+    def __init__(self, data_map: DataMap):
+        self.data_map = data_map
+        self.version = None
+        self.stats = {"runs": 0, "rebuilt": 0, "recomputed": 0, "seconds": 0.0}
+        # Transitive closure in both directions, every node maps to the set of nodes it reaches and is reached by
+        self._downstream = {}
+        self._upstream = {}
+
+    def reaches(self, source: str, target: str):
+        return target in self._downstream.get(source, ())
+
+    def downstream(self, name: str, kind: str = None):
+        return self._filter(self._downstream.get(name, ()), kind)
+
+    def upstream(self, name: str, kind: str = None):
+        return self._filter(self._upstream.get(name, ()), kind)
+
+    def _filter(self, names, kind: str = None):
+        if kind is None:
+            return list(names)
+        return [name for name in names if self.data_map.node(name).kind == kind]
+
+    def touching(self, element: str, kind: str = None):
+        # Everything downstream of whatever holds the data element, e.g. the vendors and models that can touch SSN
+        sources = set()
+        for owner in self.data_map.element_owners(element):
+            sources.add(owner)
+            sources.update(self._upstream.get(owner, ()))
+        reached = set()
+        for source in sources:
+            reached.update(self._downstream.get(source, ()))
+        reached.update(sources)
+        return self._filter(reached, kind)
+
+    def shortest_path(self, source: str, target: str):
+        if source == target:
+            return [source] if source in self.data_map else None
+        if not self.reaches(source, target):
+            return None
+        # Breadth first, only stepping onto nodes that still lead to the target
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            name = queue.popleft()
+            for successor in self.data_map.successors(name):
+                if successor in previous or (successor != target and not self.reaches(successor, target)):
+                    continue
+                previous[successor] = name
+                if successor == target:
+                    path = [target]
+                    while previous[path[-1]] is not None:
+                        path.append(previous[path[-1]])
+                    return path[::-1]
+                queue.append(successor)
+        return None
+
+    def _order(self, region, neighbours):
+        # Region nodes with the nodes they depend on first, nodes on a cycle are appended in region order
+        remaining = {name: 0 for name in region}
+        for name in region:
+            for neighbour in neighbours(name):
+                if neighbour in remaining:
+                    remaining[name] += 1
+        dependants = {name: [] for name in region}
+        for name in region:
+            for neighbour in neighbours(name):
+                if neighbour in dependants:
+                    dependants[neighbour].append(name)
+        order = [name for name, count in remaining.items() if count == 0]
+        for name in order:
+            for dependant in dependants[name]:
+                remaining[dependant] -= 1
+                if remaining[dependant] == 0:
+                    order.append(dependant)
+        acyclic = len(order) == len(region)
+        if not acyclic:
+            ordered = set(order)
+            order += [name for name in region if name not in ordered]
+        return order, acyclic
+
+    def _settle(self, region, closure, neighbours):
+        # Recompute the closure of every region node from its neighbours, region nodes start empty so a cycle
+        # is iterated up to its least fixed point
+        for name in region:
+            closure[name] = set()
+        order, acyclic = self._order(region, neighbours)
+        changed = True
+        while changed:
+            changed = False
+            for name in order:
+                reached = set()
+                for neighbour in neighbours(name):
+                    reached.add(neighbour)
+                    reached.update(closure[neighbour])
+                if reached != closure[name]:
+                    closure[name] = reached
+                    changed = True
+            if acyclic:
+                break
+        self.stats["recomputed"] += len(region)
+
+    def _link(self, source: str, target: str):
+        downstream = self._downstream
+        upstream = self._upstream
+        if target in downstream[source]:
+            return
+        reached = {target, *downstream[target]}
+        reaching = {source, *upstream[source]}
+        for name in reaching:
+            downstream[name].update(reached)
+        for name in reached:
+            upstream[name].update(reaching)
+
+    def _rebuild(self):
+        names = [node.name for node in self.data_map.nodes()]
+        self._downstream, self._upstream = {}, {}
+        self._settle(names, self._downstream, self.data_map.successors)
+        self._settle(names, self._upstream, self.data_map.predecessors)
+        self.stats["rebuilt"] += 1
+
+    def _apply(self, changes):
+        data_map = self.data_map
+        removed_edges, removed_nodes = [], []
+        # Additions only ever grow the closure and are folded in directly
+        for change, key, added in changes:
+            if change == NODE_CHANGE:
+                if key in data_map:
+                    self._downstream.setdefault(key, set())
+                    self._upstream.setdefault(key, set())
+                else:
+                    removed_nodes.append(key)
+            elif change == EDGE_CHANGE:
+                if data_map.has_edge(*key):
+                    self._link(*key)
+                else:
+                    removed_edges.append(key)
+        if not removed_edges and not removed_nodes:
+            return
+        # A removal can only shrink what the nodes upstream of it reach and what reaches the nodes downstream of it
+        upstream_region, downstream_region = {}, {}
+        for source, target in removed_edges:
+            for name in (source, *self._upstream.get(source, ())):
+                upstream_region[name] = None
+            for name in (target, *self._downstream.get(target, ())):
+                downstream_region[name] = None
+        for name in removed_nodes:
+            upstream_region.update(dict.fromkeys(self._upstream.get(name, ())))
+            downstream_region.update(dict.fromkeys(self._downstream.get(name, ())))
+        for name in removed_nodes:
+            self._downstream.pop(name, None)
+            self._upstream.pop(name, None)
+        self._settle([name for name in upstream_region if name in data_map], self._downstream, data_map.successors)
+        self._settle([name for name in downstream_region if name in data_map], self._upstream,
+                     data_map.predecessors)
+
+    @metrics.timed("lineage.update")
+    def update(self):
+        if self.version == self.data_map.version:
+            return
+        started = time.perf_counter()
+        changes = None if self.version is None else self.data_map.changes_since(self.version)
+        if changes is None:
+            self._rebuild()
+        else:
+            self._apply(changes)
+        self.version = self.data_map.version
+        self.stats["runs"] += 1
+        self.stats["seconds"] = time.perf_counter() - started
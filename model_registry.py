@@ -0,0 +1,132 @@
+import time
+
+from data_map import ASSET, ATTRS_CHANGE, EDGE_CHANGE, MODEL, NODE_CHANGE, PROCESSING_ACTIVITY, VENDOR, DataMap
+from instrumentation import metrics
+
+# Inverted index fields, a model is impacted by a change to any value it is indexed under
+PURPOSE = "purpose"
+ASSET_SOURCE = "asset"
+VENDOR_LINK = "vendor"
+ELEMENT_INPUT = "element"
+INDEX_FIELDS = (PURPOSE, ASSET_SOURCE, VENDOR_LINK, ELEMENT_INPUT)
+
+
+def register_model(data_map: DataMap, name: str, description: str, purpose: str, elements=(), assets=(), vendors=(),
+                   version: str = None):
+    # The registry lives on the model node and its links: activity -> model, asset -> model and model -> vendor
+    node = data_map.node(name)
+    versions = list(node.attrs.get("versions", [])) if node is not None else []
+    if version and version not in [entry["version"] for entry in versions]:
+        versions.append({"version": version, "registered_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+    data_map.add_node(name, MODEL, description=description, purpose=purpose, elements=sorted(set(elements)),
+                      versions=versions)
+    data_map.add_node(purpose, PROCESSING_ACTIVITY)
+    data_map.add_edge(purpose, name)
+    for asset in assets:
+        data_map.add_node(asset, ASSET)
+        data_map.add_edge(asset, name)
+    for vendor in vendors:
+        data_map.add_node(vendor, VENDOR)
+        data_map.add_edge(name, vendor)
+
+
+class ModelRegistry:
+    def __init__(self, data_map: DataMap):
+        self.data_map = data_map
+        self.version = None
+        self.stats = {"runs": 0, "rebuilt": 0, "reindexed": 0}
+        # field -> value -> models, and per model the (field, value) keys it is indexed under
+        self._index = {field: {} for field in INDEX_FIELDS}
+        self._keys = {}
+
+    def _model_keys(self, name: str):
+        node = self.data_map.node(name)
+        if node is None or node.kind != MODEL:
+            return set()
+        keys = set()
+        if node.attrs.get("purpose"):
+            keys.add((PURPOSE, node.attrs["purpose"]))
+        keys.update((ELEMENT_INPUT, element) for element in node.attrs.get("elements", ()))
+        for source in self.data_map.predecessors(name):
+            kind = self.data_map.node(source).kind
+            if kind == PROCESSING_ACTIVITY:
+                keys.add((PURPOSE, source))
+            elif kind == ASSET:
+                keys.add((ASSET_SOURCE, source))
+        for target in self.data_map.successors(name):
+            if self.data_map.node(target).kind == VENDOR:
+                keys.add((VENDOR_LINK, target))
+        return keys
+
+    def _reindex(self, name: str):
+        old = self._keys.get(name, set())
+        new = self._model_keys(name)
+        for field, value in old - new:
+            models = self._index[field][value]
+            del models[name]
+            if not models:
+                del self._index[field][value]
+        for field, value in new - old:
+            self._index[field].setdefault(value, {})[name] = None
+        if new:
+            self._keys[name] = new
+        else:
+            self._keys.pop(name, None)
+        self.stats["reindexed"] += 1
+
+    @metrics.timed("model_registry.update")
+    def update(self):
+        if self.version == self.data_map.version:
+            return
+        changes = None if self.version is None else self.data_map.changes_since(self.version)
+        if changes is None:
+            self._index = {field: {} for field in INDEX_FIELDS}
+            self._keys = {}
+            dirty = dict.fromkeys(self.data_map.names(MODEL))
+            self.stats["rebuilt"] += 1
+        else:
+            # Only models whose node or links changed are reindexed
+            dirty = {}
+            for change, key, _ in changes:
+                if change in (NODE_CHANGE, ATTRS_CHANGE):
+                    if key in self._keys or key in self.data_map and self.data_map.node(key).kind == MODEL:
+                        dirty[key] = None
+                elif change == EDGE_CHANGE:
+                    for name in key:
+                        if name in self._keys or name in self.data_map and self.data_map.node(name).kind == MODEL:
+                            dirty[name] = None
+        for name in dirty:
+            self._reindex(name)
+        self.version = self.data_map.version
+        self.stats["runs"] += 1
+
+    def models(self, field: str, value: str):
+        return list(self._index[field].get(value, ()))
+
+    def record(self, name: str):
+        node = self.data_map.node(name)
+        if node is None or node.kind != MODEL:
+            return None
+        keys = self._keys.get(name, set())
+        return {
+            "name": name,
+            "description": node.attrs.get("description", ""),
+            "purposes": sorted(value for field, value in keys if field == PURPOSE),
+            "elements": sorted(value for field, value in keys if field == ELEMENT_INPUT),
+            "assets": sorted(value for field, value in keys if field == ASSET_SOURCE),
+            "vendors": sorted(value for field, value in keys if field == VENDOR_LINK),
+            "versions": [entry["version"] for entry in node.attrs.get("versions", [])],
+        }
+
+    def impact_report(self, purposes=(), assets=(), vendors=(), elements=()):
+        # Models impacted by withdrawing consent for purposes or deleting assets, vendors or data elements, with
+        # every reason each model is impacted; one index lookup per changed value
+        report = {}
+        for field, values, reason in ((PURPOSE, purposes, "consent withdrawn for purpose"),
+                                      (ASSET_SOURCE, assets, "source asset deleted"),
+                                      (VENDOR_LINK, vendors, "vendor removed"),
+                                      (ELEMENT_INPUT, elements, "input data element removed")):
+            for value in values:
+                for model in self._index[field].get(value, ()):
+                    report.setdefault(model, []).append(f"{reason} '{value}'")
+        return report
@@ -0,0 +1,170 @@
+import textwrap
+
+
+def compile_narrative(*parts):
+    # Dedented and joined once at import, sections only emit the finished markdown on each rerun
+    return "\n\n".join(textwrap.dedent(part).strip() for part in parts)
+
+
+OVERVIEW_NARRATIVE = compile_narrative(
+    """
+        **Data Mapping Overview**
+
+        At the core of our platform lies the Data Map, a pivotal component orchestrating the myriad interactions and processes. This framework is built upon fundamental concepts including Assets, Processing Activities, Legal Entities, and Vendors, each serving a distinct role in the comprehensive management and safeguarding of data.
+        """,
+    """
+        **Enhancing Platform Integration through Comprehensive Data Mapping**
+
+        As we strive for a seamless and comprehensive integration across our platform, the integration of key components such as Consent, Cookies, Data Subject Access Requests (DSAR), and Data Discovery with Data Mapping is essential. This strategic alignment is crucial for elevating our platform's functionality, compliance, and user trust.
+
+        **Consent Integration**: Ensures that user preferences are accurately reflected across all data processing activities, enabling more granular control and transparency over personal data usage.
+
+        **Cookies Management**: By integrating Cookies Management with Data Mapping, users are given precise control over their data, enhancing privacy protections in line with their consent preferences.
+
+        **DSAR Fulfillment**: Streamlines the processing of Data Subject Access Requests, ensuring comprehensive, accurate, and timely responses, thereby reinforcing our commitment to user rights and regulatory compliance.
+
+        **Data Discovery**: Plays a critical role in identifying and classifying data across various sources, ensuring that every piece of data is accurately mapped and managed within our platform.
+
+        Achieving a fully integrated Data Mapping system fortifies our compliance posture and enhances user trust, making our platform not just compliant with current regulations but also ready for the future of data privacy.
+    """,
+)
+
+PURPOSES_NARRATIVE = compile_narrative(
+    """
+        **Introduction to Purposes**
+
+        There are three fundamental questions that a privacy governance platform should be able to answer:
+
+        1. What data do I have? This pertains to privacy. An enterprise typically has data stored across hundreds of systems, used in various ways. For the data governance persona, the initial step is to understand all the data the enterprise possesses.
+
+        2. Why do I have the data? Understanding the purpose is crucial. Enterprises collect data for specific purposes, and these must be identified and documented. This is vital for ensuring that enterprises have the necessary user consents, as they may otherwise unknowingly violate regulatory compliance.
+
+        3. What are my responsibilities with this data? Enterprises must understand their obligations regarding user data, including compliance with regulations such as data masking and deletion based on retention policies.
+
+        The platform provides tools such as multimodal data discovery methods, including assessments, imports, data mapping, and data discovery, to answer the first question, This pertains to privacy, as an enterprise typically has data stored across hundreds of systems, used in various ways. For the data governance persona, the initial step is to understand all the data the enterprise possesses.
+
+        The platform also offers the consent platform to capture consents from users, addressing the second question. However, it falls short in connecting this with the data we discover. This crucial aspect is addressed in the following sections.
+
+        Finally our platform continues to address the third question by providing tools to handle data responsibly. We help enterprises understand their obligations when handling customer data, flag risks, and recommend controls, with GRC playing a significant role.
+        """,
+    """
+        **Purpose Management Overview**
+
+        Purpose management is a critical aspect of our privacy tech platform, providing the foundation for linking data to specific use cases or intentions. This functionality enables enterprises to manage and track the reasons for which personal data is processed, ensuring compliance with privacy regulations and enhancing data governance practices.
+        """,
+    """
+        **Linking Purposes to Data**
+
+        This functionality allows data stewards to select objects from the catalog and link them to one or more purposes. By linking purposes to data, enterprises can ensure that data processing activities are aligned with the intended use cases and purposes specified in their privacy policies. The process of linking identified data to purposes shows a central list of purposes maintained on the consent platform, ensuring consistency and accuracy.
+        """,
+    """
+        **Surfacing Purposes from Central List**
+
+        Purposes are maintained centrally on the consent platform. When linking identified data to purposes, users can select from a central list of purposes, ensuring consistency and accuracy across the platform.
+        """,
+    """
+        **Adding New Purposes**
+
+        Enterprises often need to add new purposes dynamically to reflect changes in data processing activities or to comply with new regulatory requirements. This functionality enables users to add new purposes on the fly, ensuring that the platform remains flexible and adaptable to evolving privacy needs. The purpose discovery process automatically updates the central purpose repository, unifying all purposes in the platform.
+        """,
+    """
+        **Launching Purpose Discovery Assessments**
+
+        Purpose discovery assessments are crucial for capturing purposes from different teams and departments within an organization. This functionality streamlines the process of gathering purpose information, ensuring that all relevant stakeholders are involved in defining and documenting data processing purposes.
+        """,
+    """
+        **Updating Asset Discovery Templates**
+
+        Asset discovery templates need to be updated to capture purposes associated with data elements. This functionality ensures that purposes are included in the data discovery process, providing visibility into how data is being used and for what purposes.
+        """,
+    """
+        **Backpropagating Newly Discovered Purposes to Consent Module**
+
+        This functionality enables the persona to create new collection points to gather consents for newly discovered purposes. By backpropagating purposes to the consent module, enterprises can ensure that all data processing activities have appropriate consents in place.
+        """,
+    """
+        **Updating Data Map with Purposes**
+
+        The data map is updated with purposes linked to data elements, along with granular stats on how many users have consented to these purposes and how many haven't. This provides a comprehensive view of data usage and consent status across the organization.
+        """,
+    """
+        **Building Tooling to Surface Data Subject Level Consent Data**
+
+        Tooling is built to surface data subject level consent data based on identified purposes. This data is then sent back to third party systems or teams to ensure that they are using only data for which they have user consent, thus ensuring compliance with privacy regulations.
+        """,
+)
+
+LINEAGE_NARRATIVE = compile_narrative(
+    """
+        **Lineage and Reachability:** Ask which vendors and models can touch a data element, what a node feeds into, what feeds into it, and how two nodes are connected.
+    """,
+)
+
+COOKIES_NARRATIVE = compile_narrative(
+    """
+        **Cookies Data Mapping Integration:** This integration enhances user privacy and data governance by mapping cookies to assets within the Data Map. It allows for precise control over cookie data, aligning with user consent and regulatory requirements. By scanning website domains for cookies and categorizing them accurately in the Data Map, we ensure transparency and compliance in how cookie data is handled.
+    """,
+)
+
+VENDOR_ENGAGEMENTS_NARRATIVE = compile_narrative(
+    """
+    **Vendor Engagements for Comprehensive Risk Management:**
+    Vendor risk management is an essential element of any privacy strategy. The OneTrust platform enhances this by offering capabilities to import vendors and assess their risks. With the growing need for oversight over third, fourth, and fifth-party vendors, managing these complex relationships becomes more challenging. OneTrust simplifies this by allowing these multi-tier vendor engagements to be grouped under a single framework, enabling consistent risk management across all vendor levels.
+    """,
+)
+
+DATA_DISCOVERY_NARRATIVE = compile_narrative(
+    """
+        **Optimizing Data Management through Data Discovery Integration**
+
+        Data Discovery serves as the cornerstone of our platform's approach to proactive data management and compliance. By connecting to a multitude of data sources, Data Discovery delves deep into the digital expanse, extracting and classifying the wealth of data contained within. This process is not just about uncovering data; it's about understanding its nature, relevance, and implications for privacy and compliance.
+
+        **Initiating Data Discovery:**
+
+        The journey begins with the identification of data sources. Users are prompted to provide the name of the data source, setting the stage for a comprehensive scanning and classification process. This step is pivotal, as it not only earmarks the source for exploration but also tailors the discovery process to the unique characteristics of each data repository.
+
+        **Scanning and Classification:**
+
+        Following the identification of the data source, the next phase involves the meticulous scanning of the source, with a keen eye on the Personally Identifiable Information (PII) it harbors. Users select the PIIs of interest, guiding the classification engine in its quest to map the data landscape accurately. This simulation of scanning and classification embodies our platform's commitment to precision and thoroughness in data discovery.
+
+        **Integration into Data Mapping:**
+
+        The culmination of Data Discovery is marked by the seamless integration of findings into the Data Map. Each data source, once defined and scanned, is elevated to the status of an Asset within the Data Map. Concurrently, the discovered PIIs are meticulously cataloged as Data Elements under this newly minted Asset. This integration is a testament to our holistic view of data management, where every piece of information is accounted for, its origins traced, and its implications understood.
+
+        **A Unified Approach to Data Governance:**
+
+        By integrating Data Discovery with Data Mapping, we achieve a unified approach to data governance. This strategy not only enhances our ability to manage data with unparalleled precision but also strengthens our compliance posture. Each Asset and its associated Data Elements become integral components of our Data Map, enriching it with insights and intelligence gleaned from the farthest reaches of our digital ecosystem.
+
+        The integration of Data Discovery with Data Mapping is not merely a procedural enhancement; it's a strategic pivot towards more insightful, compliant, and effective data governance. It underscores our commitment to harnessing the full potential of our data assets while safeguarding the privacy and security of the information entrusted to us.
+        """,
+)
+
+DSAR_NARRATIVE = compile_narrative(
+    """
+        **Streamlining DSAR Integration into Data Mapping**
+        The essence of Data Subject Access Requests (DSAR) transcends the mere act of solicitation for personal data; it marks a critical intersection of user empowerment and systemic transparency. Integrating DSAR with Data Mapping amplifies this synergy, embodying our commitment to operational excellence and regulatory adherence.
+        ...
+        By navigating this path, we set a new benchmark for data stewardship, one that harmonizes the intricacies of Data Mapping with the fundamental rights of our users. The journey of integrating DSAR with Data Mapping is a vivid reflection of our dedication to privacy, precision, and proactive engagement.
+    """,
+)
+
+CONSENT_NARRATIVE = compile_narrative(
+    """
+        In the realm of data privacy and compliance, the **Consent Integration** process plays a pivotal role, primarily focusing on the seamless interplay between **Purposes**, **Data Elements**, and **Collection Points**. This process is foundational for ensuring that user consents are meticulously captured, managed, and integrated within the Data Mapping infrastructure, thereby adhering to regulatory requirements and safeguarding user privacy.
+
+        **Collection Points:** The avenues through which user consents are obtained—ranging from web forms to mobile applications—are abstracted as Collection Points. These points are not just channels of interaction but are critical in capturing the context of user consents, delineating the specific conditions under which user data may be collected and processed.
+
+        **Purposes:** At the heart of the Consent Integration process lies the Purpose. It serves as a transparent declaration to users, outlining the intent behind data collection. This clarity is crucial for obtaining informed consents, thereby instilling trust and ensuring compliance with data protection regulations. Within the Data Mapping framework, each Purpose is intricately linked to a Processing Activity, endowed with a property known as the Legal Basis. It is this Legal Basis that imbues the Processing Activity with regulatory legitimacy, directly stemming from the user's consent.
+
+        **Data Elements:** The Consent Integration process acknowledges the dynamic nature of data collection by allowing for the creation and selection of Data Elements. These elements form the substantive content of consent. Upon selection, these Data Elements are now published to Data Mapping, where they are meticulously mapped to the corresponding Collection Point, ensuring a direct relationship between where the data is collected and the data itself.
+
+        This structured approach to Consent Integration enhances the transparency and accountability of data processing activities by explicitly linking Collection Points to Data Elements and Purposes to Processing Activities, ensuring every piece of user data is managed with the utmost respect for user privacy and legal compliance.
+    """,
+)
+
+AI_GOVERNANCE_NARRATIVE = compile_narrative(
+    """
+        **AI Governance:**
+        The OneTrust Platform introduces a comprehensive AI Governance solution designed to empower customers in the oversight of their AI initiatives. Central to this governance is the Model object, a construct that encapsulates the essence of an AI model, ensuring transparency and accountability. Through the Model object, users have the capability to define critical attributes such as the model's name, its descriptive overview, and its intended purpose. This facilitates a meticulous recording of the AI model's parameters, including the datasets it relies upon, which may carry inherent biases. By capturing this information, the platform aids in identifying and mitigating potential biases, ensuring AI implementations are both ethical and effective. Each Model object is integrated within the platform's data map where the model object is linked to its purpose, captured as a Processing Activity, providing a clear and structured representation of how AI models interact with and impact data governance landscapes.
+    """,
+)
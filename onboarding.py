@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+import os
+import time
+
+from data_map import ASSET, PROCESSING_ACTIVITY, VENDOR, DataMap
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+# Names are stored in VARCHAR(255) columns
+MAX_NAME_LENGTH = 255
+
+
+class OnboardingPlan:
+    __slots__ = ("rows", "rejected", "nodes", "edges", "elements", "errors")
+
+    def __init__(self):
+        self.rows = 0
+        # A rejected row can have several errors
+        self.rejected = 0
+        # name -> kind, (source, target) and asset -> elements, dicts double as ordered sets
+        self.nodes = {}
+        self.edges = {}
+        self.elements = {}
+        self.errors = []
+
+
+def detect_format(filename: str):
+    file_format = FORMATS.get(os.path.splitext(filename)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Unsupported onboarding file format: {filename}")
+    return file_format
+
+
+def read_rows(text: str, file_format: str):
+    # Yields (line number, row), rows that cannot be parsed at all are yielded as their error message
+    if file_format == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        for row in reader:
+            yield reader.line_num, "Row has more fields than the header." if None in row else row
+        return
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+            continue
+        yield line_number, row if isinstance(row, dict) else "Expected a JSON object."
+
+
+def _names(value):
+    # Lists in JSONL, semicolon separated in CSV
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(";")
+    return [str(name).strip() for name in value if str(name).strip()]
+
+
+def _name(value):
+    return str(value).strip() if value is not None else ""
+
+
+def plan_onboarding(rows, data_map: DataMap, allowed_elements=None):
+    # One validating pass over every row, duplicates across rows and against the data map collapse into the plan.
+    # A row with any error contributes nothing.
+    plan = OnboardingPlan()
+    for line_number, row in rows:
+        plan.rows += 1
+        if isinstance(row, str):
+            plan.rejected += 1
+            plan.errors.append((line_number, row))
+            continue
+        engagement = _name(row.get("engagement"))
+        asset = _name(row.get("asset"))
+        vendors = _names(row.get("vendors"))
+        elements = _names(row.get("elements"))
+
+        errors = []
+        if not engagement and not asset:
+            errors.append("Row needs an engagement or an asset.")
+        if elements and not asset:
+            errors.append("Data elements need an asset.")
+        if allowed_elements is not None:
+            errors += [f"Unknown data element '{element}'." for element in elements if element not in allowed_elements]
+        row_nodes = [(engagement, PROCESSING_ACTIVITY)] if engagement else []
+        row_nodes += [(asset, ASSET)] if asset else []
+        row_nodes += [(vendor, VENDOR) for vendor in vendors]
+        row_kinds = {}
+        for name, kind in row_nodes:
+            if len(name) > MAX_NAME_LENGTH:
+                errors.append(f"Name '{name[:40]}...' is longer than {MAX_NAME_LENGTH} characters.")
+                continue
+            row_kind = row_kinds.setdefault(name, kind)
+            if row_kind != kind:
+                errors.append(f"'{name}' is used as both {row_kind.replace('_', ' ')} and {kind.replace('_', ' ')} "
+                              f"in this row.")
+                continue
+            existing = data_map.node(name)
+            existing_kind = existing.kind if existing is not None else plan.nodes.get(name, kind)
+            if existing_kind != kind:
+                errors.append(f"'{name}' is already a {existing_kind.replace('_', ' ')}.")
+        if errors:
+            plan.rejected += 1
+            plan.errors.extend((line_number, error) for error in errors)
+            continue
+
+        for name, kind in row_nodes:
+            plan.nodes[name] = kind
+        # Vendors hang off the engagement when there is one, otherwise off the asset
+        owner = engagement or asset
+        for vendor in vendors:
+            plan.edges[(owner, vendor)] = None
+        if engagement and asset:
+            plan.edges[(engagement, asset)] = None
+        if elements:
+            plan.elements.setdefault(asset, {}).update(dict.fromkeys(elements))
+    return plan
+
+
+def apply_plan(data_map: DataMap, plan: OnboardingPlan):
+    # Everything was validated up front, so applying cannot fail half way through
+    nodes_added = 0
+    for name, kind in plan.nodes.items():
+        if name not in data_map:
+            data_map.add_node(name, kind)
+            nodes_added += 1
+    elements_added = sum(len(data_map.add_elements(asset, elements)) for asset, elements in plan.elements.items())
+    edges_added = sum(data_map.add_edge(source, target) for source, target in plan.edges)
+    return nodes_added, elements_added, edges_added
+
+
+class OnboardingResult:
+    __slots__ = ("rows", "rejected", "nodes_added", "elements_added", "edges_added", "errors", "seconds")
+
+    def __init__(self, plan: OnboardingPlan, nodes_added: int, elements_added: int, edges_added: int,
+                 seconds: float):
+        self.rows = plan.rows
+        self.rejected = plan.rejected
+        self.nodes_added = nodes_added
+        self.elements_added = elements_added
+        self.edges_added = edges_added
+        self.errors = plan.errors
+        self.seconds = seconds
+
+
+def onboard(data_map: DataMap, text: str, file_format: str, allowed_elements=None):
+    started = time.perf_counter()
+    plan = plan_onboarding(read_rows(text, file_format), data_map, allowed_elements)
+    counts = apply_plan(data_map, plan)
+    return OnboardingResult(plan, *counts, time.perf_counter() - started)
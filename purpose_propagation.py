@@ -0,0 +1,126 @@
+import time
+
+from data_map import EDGE_CHANGE, NODE_CHANGE, PROCESSING_ACTIVITY, DataMap
+from instrumentation import metrics
+
+
+class PurposePropagation:
+    def __init__(self, data_map: DataMap):
+        self.data_map = data_map
+        self.version = None
+        self.stats = {"runs": 0, "rebuilt": 0, "touched": 0, "seconds": 0.0}
+        # Purposes reaching each node and, inverted, the nodes each purpose reaches
+        self._purposes = {}
+        self._tagged = {}
+
+    def purposes(self, name: str):
+        return list(self._purposes.get(name, ()))
+
+    def tagged(self, purpose: str):
+        return list(self._tagged.get(purpose, ()))
+
+    def _set(self, name: str, purposes):
+        current = self._purposes.get(name, {})
+        for purpose in current:
+            if purpose not in purposes:
+                del self._tagged[purpose][name]
+                if not self._tagged[purpose]:
+                    del self._tagged[purpose]
+        for purpose in purposes:
+            if purpose not in current:
+                self._tagged.setdefault(purpose, {})[name] = None
+        if purposes:
+            self._purposes[name] = purposes
+        else:
+            self._purposes.pop(name, None)
+
+    def _compute(self, name: str):
+        # A processing activity is its own purpose and everything it links to, directly or through an asset or
+        # owned data element, is tagged with it
+        purposes = {}
+        node = self.data_map.node(name)
+        if node is not None and node.kind == PROCESSING_ACTIVITY:
+            purposes[name] = None
+        for source in self.data_map.predecessors(name):
+            purposes.update(self._purposes.get(source, {}))
+        return purposes
+
+    def _affected(self, dirty):
+        # Downstream closure of the dirty nodes in topological order, nodes on a cycle are appended in visit order
+        region = {}
+        stack = [name for name in dirty if name in self.data_map]
+        while stack:
+            name = stack.pop()
+            if name not in region:
+                region[name] = None
+                stack.extend(self.data_map.successors(name))
+        in_degree = {name: 0 for name in region}
+        for name in region:
+            for target in self.data_map.successors(name):
+                in_degree[target] += 1
+        order = [name for name, degree in in_degree.items() if degree == 0]
+        for name in order:
+            for target in self.data_map.successors(name):
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    order.append(target)
+        acyclic = len(order) == len(region)
+        if not acyclic:
+            ordered = set(order)
+            order += [name for name in region if name not in ordered]
+        return order, acyclic
+
+    def _propagate(self, dirty):
+        order, acyclic = self._affected(dirty)
+        if acyclic:
+            # Only nodes whose inputs changed are recomputed, an unchanged result stops the walk below it
+            touched = 0
+            for name in order:
+                if name not in dirty:
+                    continue
+                touched += 1
+                purposes = self._compute(name)
+                if purposes != self._purposes.get(name, {}):
+                    self._set(name, purposes)
+                    dirty.update(dict.fromkeys(self.data_map.successors(name)))
+            return touched
+        # A cycle can keep a purpose nothing reaches anymore alive, so the region starts empty and is iterated up
+        # to its least fixed point
+        for name in order:
+            self._set(name, {})
+        changed = True
+        while changed:
+            changed = False
+            for name in order:
+                purposes = self._compute(name)
+                if purposes != self._purposes.get(name, {}):
+                    self._set(name, purposes)
+                    changed = True
+        return len(order)
+
+    @metrics.timed("purposes.update")
+    def update(self):
+        if self.version == self.data_map.version:
+            return 0
+        started = time.perf_counter()
+        changes = None if self.version is None else self.data_map.changes_since(self.version)
+        if changes is None:
+            self._purposes, self._tagged = {}, {}
+            dirty = dict.fromkeys(node.name for node in self.data_map.nodes())
+            self.stats["rebuilt"] += 1
+        else:
+            dirty = {}
+            for change, key, added in changes:
+                if change == NODE_CHANGE:
+                    if key in self.data_map:
+                        dirty[key] = None
+                    else:
+                        self._set(key, {})
+                elif change == EDGE_CHANGE:
+                    dirty[key[1]] = None
+        touched = self._propagate(dirty)
+        self.version = self.data_map.version
+        self.stats["runs"] += 1
+        self.stats["touched"] = touched
+        self.stats["seconds"] = time.perf_counter() - started
+        return touched
@@ -0,0 +1,59 @@
+import json
+import os
+from collections.abc import Mapping
+
+# Read from the Streamlit secrets, falling back to the process environment
+REQUIRED_SETTINGS = ("GOOGLE_APPLICATION_CREDENTIALS", "SQL_SERVER", "SQL_DATABASE", "SQL_USERNAME", "SQL_PASSWORD",
+                     "MYSQL_CONNECTION_STRING")
+
+
+class Settings:
+    __slots__ = ("instance_connection_name", "sql_server", "database", "username", "password", "credentials_info")
+
+    def __init__(self, instance_connection_name: str, sql_server: str, database: str, username: str, password: str,
+                 credentials_info: dict):
+        self.instance_connection_name = instance_connection_name
+        self.sql_server = sql_server
+        self.database = database
+        self.username = username
+        self.password = password
+        self.credentials_info = credentials_info
+
+    def __repr__(self):
+        # Never the password or the key material
+        return f"Settings({self.instance_connection_name!r}, database={self.database!r}, user={self.username!r})"
+
+    def credentials(self):
+        import google.auth
+
+        credentials, _ = google.auth.load_credentials_from_dict(self.credentials_info)
+        return credentials
+
+
+def _credentials_info(value):
+    # The credentials JSON itself, a TOML table or the path of a key file, read once and kept in memory
+    if isinstance(value, Mapping):
+        info = dict(value)
+    else:
+        if os.path.isfile(value):
+            with open(value, encoding="utf-8") as key_file:
+                value = key_file.read()
+        try:
+            info = json.loads(value)
+        except ValueError:
+            raise ValueError("GOOGLE_APPLICATION_CREDENTIALS is neither a key file nor credentials JSON.") from None
+    if not isinstance(info, dict) or "type" not in info:
+        raise ValueError("GOOGLE_APPLICATION_CREDENTIALS does not hold Google credentials.")
+    return info
+
+
+def load_settings(secrets: Mapping = None, environ: Mapping = None):
+    secrets = secrets if secrets is not None else {}
+    environ = environ if environ is not None else os.environ
+    values = {key: secrets.get(key) or environ.get(key) for key in REQUIRED_SETTINGS}
+    missing = [key for key, value in values.items() if not value]
+    if missing:
+        raise ValueError(f"Missing settings: {', '.join(missing)}.")
+    return Settings(values["MYSQL_CONNECTION_STRING"], values["SQL_SERVER"], values["SQL_DATABASE"],
+                    values["SQL_USERNAME"], values["SQL_PASSWORD"],
+                    _credentials_info(values["GOOGLE_APPLICATION_CREDENTIALS"]))
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data_map import DATA_ELEMENT, NODE_KINDS, DataMap
+
+NODES_FILE = "nodes.parquet"
+EDGES_FILE = "edges.parquet"
+# Edges refer to node rows, so the two files are only ever read as a pair: each export writes a new generation
+# directory and then atomically points CURRENT at it
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "snapshot-"
+
+# Kinds are dictionary encoded and edges and element owners refer to nodes by row index, which keeps
+# the snapshot compact. Data elements store no attrs, they are rebuilt from the owner and label.
+NODES_SCHEMA = pa.schema([
+    ("name", pa.string()),
+    ("kind", pa.dictionary(pa.int8(), pa.string())),
+    ("label", pa.string()),
+    ("attrs", pa.string()),
+    ("owner", pa.int32()),
+])
+EDGES_SCHEMA = pa.schema([
+    ("source", pa.int32()),
+    ("target", pa.int32()),
+])
+
+
+def _generation_dir(path: str):
+    # Snapshots written before generations keep their files in path itself
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as current:
+            return os.path.join(path, current.read().strip())
+    except FileNotFoundError:
+        return path
+
+
+def _write_durably(write, target: str):
+    write(target)
+    with open(target, "rb") as written:
+        os.fsync(written.fileno())
+
+
+def export_snapshot(data_map: DataMap, path: str):
+    os.makedirs(path, exist_ok=True)
+    previous = _generation_dir(path)
+    generation = f"{GENERATION_PREFIX}{time.time_ns()}"
+    directory = os.path.join(path, generation)
+    os.makedirs(directory)
+    nodes = data_map.nodes()
+    index = {node.name: position for position, node in enumerate(nodes)}
+    kinds = pa.array([node.kind for node in nodes], pa.string()).dictionary_encode()
+    nodes_table = pa.Table.from_arrays([
+        pa.array([node.name for node in nodes], pa.string()),
+        pa.DictionaryArray.from_arrays(kinds.indices.cast(pa.int8()), kinds.dictionary),
+        pa.array([node.label if node.label != node.name else None for node in nodes], pa.string()),
+        pa.array([json.dumps(node.attrs) if node.attrs and node.kind != DATA_ELEMENT else None for node in nodes],
+                 pa.string()),
+        pa.array([index[node.attrs["owner"]] if node.kind == DATA_ELEMENT else None for node in nodes], pa.int32()),
+    ], schema=NODES_SCHEMA)
+    edges = data_map.edges()
+    edges_table = pa.Table.from_arrays([
+        pa.array([index[source] for source, _ in edges], pa.int32()),
+        pa.array([index[target] for _, target in edges], pa.int32()),
+    ], schema=EDGES_SCHEMA)
+    _write_durably(lambda target: pq.write_table(nodes_table, target, compression="zstd"),
+                   os.path.join(directory, NODES_FILE))
+    _write_durably(lambda target: pq.write_table(edges_table, target, compression="zstd"),
+                   os.path.join(directory, EDGES_FILE))
+
+    def write_pointer(target: str):
+        with open(target, "w", encoding="utf-8") as pointer:
+            pointer.write(generation)
+
+    _write_durably(write_pointer, os.path.join(path, CURRENT_FILE + ".tmp"))
+    os.replace(os.path.join(path, CURRENT_FILE + ".tmp"), os.path.join(path, CURRENT_FILE))
+
+    # The previous generation is kept for readers that resolved CURRENT just before the switch
+    keep = {generation, os.path.basename(previous)}
+    for entry in os.listdir(path):
+        if entry.startswith(GENERATION_PREFIX) and entry not in keep:
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+    if previous != path:
+        for name in (NODES_FILE, EDGES_FILE):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+
+
+def read_snapshot(path: str):
+    path = _generation_dir(path)
+    nodes_table = pq.read_table(os.path.join(path, NODES_FILE), memory_map=True)
+    edges_table = pq.read_table(os.path.join(path, EDGES_FILE), memory_map=True)
+    names = nodes_table.column("name").to_pylist()
+    kinds = nodes_table.column("kind").to_pylist()
+    labels = nodes_table.column("label").to_pylist()
+    owners = nodes_table.column("owner").to_pylist()
+    attrs = [
+        json.loads(value) if value is not None else
+        {"owner": names[owner], "element": label} if owner is not None else {}
+        for value, owner, label in zip(nodes_table.column("attrs").to_pylist(), owners, labels)
+    ]
+    unknown = set(kinds) - set(NODE_KINDS)
+    if unknown:
+        raise ValueError(f"Snapshot contains unknown node kinds: {', '.join(sorted(unknown))}")
+    nodes = list(zip(names, kinds, labels, attrs))
+    sources = edges_table.column("source").to_pylist()
+    targets = edges_table.column("target").to_pylist()
+    edges = [(names[source], names[target]) for source, target in zip(sources, targets)]
+    return nodes, edges
+
+
+def import_snapshot(path: str):
+    return DataMap.from_records(*read_snapshot(path))
@@ -0,0 +1,121 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+
+from comments import Comments
+
+WORD = re.compile(r"[a-z][a-z'-]+")
+STOPWORDS = frozenset("""
+    a about above after again against all also am an and any are as at be because been before being below between
+    both but by can could did do does doing down during each few for from further had has have having he her here
+    hers him his how i if in into is it its itself just let like make me more most much my no nor not now of off on
+    once only or other our ours out over own please same she should so some such than that the their theirs them
+    then there these they this those through to too under until up very was we were what when where which while
+    who whom why will with would you your yours yourself able add adding added get use using used would could maybe
+    really thing things think want need way also it's i'm don't can't
+""".split())
+MAX_KEYWORDS = 200
+MAX_THEMES = 10
+
+
+def keywords(text: str):
+    return [word.strip("'-") for word in WORD.findall(text.lower()) if word not in STOPWORDS and len(word) > 2]
+
+
+def empty_summary():
+    return {"count": 0, "high_water": None, "keywords": {}, "themes": {}}
+
+
+def fold_comments(summary, rows):
+    # rows are (id, comment_text, type, created_at) oldest first, the running summary only keeps bounded counts
+    keyword_counts = Counter(summary["keywords"])
+    themes = summary["themes"]
+    for comment_id, text, _, created_at in rows:
+        words = set(keywords(text))
+        keyword_counts.update(words)
+        summary["count"] += 1
+        if words:
+            # A comment joins the theme of its most common keyword so far, leaving out words that appear in most
+            # comments and tell them apart from nothing. Its first comment is kept as the example.
+            distinctive = {word for word in words
+                           if summary["count"] < 20 or keyword_counts[word] <= summary["count"] / 2} or words
+            theme = max(distinctive, key=lambda word: (keyword_counts[word], word))
+            entry = themes.setdefault(theme, {"count": 0, "example": " ".join(text.split())[:200]})
+            entry["count"] += 1
+        summary["high_water"] = [str(created_at), comment_id]
+    summary["keywords"] = dict(keyword_counts.most_common(MAX_KEYWORDS))
+    summary["themes"] = dict(sorted(themes.items(), key=lambda item: -item[1]["count"])[:MAX_KEYWORDS])
+    return summary
+
+
+def load_summary(comments: Comments, category: str):
+    stored = comments.get_category_summary(category)
+    if stored:
+        try:
+            return json.loads(stored)
+        except ValueError:
+            pass
+    return empty_summary()
+
+
+def summarize_category(comments: Comments, category: str, batch_size: int = 500):
+    # Only the comments past the stored high-water mark are read and folded into the summary
+    summary = load_summary(comments, category)
+    since = tuple(summary["high_water"]) if summary["high_water"] else None
+    folded = 0
+    batch = []
+    for row in comments.iter_user_comments_since(category, since, batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            fold_comments(summary, batch)
+            folded += len(batch)
+            batch = []
+    if batch:
+        fold_comments(summary, batch)
+        folded += len(batch)
+    if folded:
+        comments.update_category_summary(category, json.dumps(summary))
+    return summary, folded
+
+
+def format_summary(summary):
+    if not summary["count"]:
+        return None
+    top_keywords = ", ".join(f"{word} ({count})" for word, count in list(summary["keywords"].items())[:10])
+    lines = [f"**{summary['count']} suggestions.** Most mentioned: {top_keywords or 'nothing yet'}."]
+    for theme, entry in list(summary["themes"].items())[:MAX_THEMES]:
+        lines.append(f"- **{theme}** ({entry['count']}): {entry['example']}")
+    return "\n".join(lines)
+
+
+class CategorySummarizer:
+    def __init__(self, comments: Comments, categories, interval: float = 300.0):
+        self.comments = comments
+        self.categories = list(categories)
+        self.interval = interval
+        self.stats = {"runs": 0, "folded": 0, "last_run_seconds": 0.0, "last_error": None}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="category-summarizer", daemon=True)
+        self._thread.start()
+
+    def run_once(self):
+        started = time.perf_counter()
+        for category in self.categories:
+            _, folded = summarize_category(self.comments, category)
+            self.stats["folded"] += folded
+        self.stats["runs"] += 1
+        self.stats["last_run_seconds"] = time.perf_counter() - started
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+            self._stop.wait(self.interval)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
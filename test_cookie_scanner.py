@@ -0,0 +1,61 @@
+import asyncio
+
+from aiohttp import web
+
+from cookie_scanner import CookieScanner
+
+# Large enough to arrive in several chunks, the scanner has to read past the first one
+PADDING = "<p>" + "x" * 200 * 1024 + "</p>"
+
+
+def fixture_app():
+    async def index(request):
+        response = web.Response(
+            text=f"""<html><head><script src="https://www.googletagmanager.com/gtm.js"></script></head>
+            <body><a href="/p1">One</a>{PADDING}<a href="/p2">Two</a>
+            <script src="https://connect.facebook.net/en_US/fbevents.js"></script></body></html>""",
+            content_type="text/html")
+        response.set_cookie("_ga", "GA1.1.1")
+        return response
+
+    async def page_one(request):
+        response = web.Response(text='<html><a href="/">Home</a></html>', content_type="text/html")
+        response.set_cookie("_clck", "1")
+        return response
+
+    async def page_two(request):
+        return web.Response(text='<script src="https://pi.pardot.com/pd.js"></script>', content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/", index)
+    app.router.add_get("/p1", page_one)
+    app.router.add_get("/p2", page_two)
+    return app
+
+
+async def scan_fixture(scanner: CookieScanner):
+    runner = web.AppRunner(fixture_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        return await scanner.scan_async(f"http://127.0.0.1:{port}/")
+    finally:
+        await runner.cleanup()
+
+
+def test_scan_reads_whole_pages_and_follows_links():
+    result = asyncio.run(scan_fixture(CookieScanner(workers=4)))
+    assert result.pages == 3
+    assert result.errors == 0
+    assert {name for name, _ in result.cookies} == {"_ga", "_clck"}
+    assert result.script_hosts == {"www.googletagmanager.com", "connect.facebook.net", "pi.pardot.com"}
+    assert result.vendors == {"Google", "Meta", "Microsoft", "Salesforce"}
+
+
+def test_scan_stops_reading_at_the_page_cap():
+    result = asyncio.run(scan_fixture(CookieScanner(workers=4, max_page_bytes=1024)))
+    assert result.pages == 2
+    assert "connect.facebook.net" not in result.script_hosts
+    assert result.vendors == {"Google", "Microsoft"}
@@ -0,0 +1,69 @@
+import os
+
+from data_map import ASSET, PROCESSING_ACTIVITY, DataMap
+from data_map_store import DataMapReplica, DataMapStore
+from db import ConnectionPool, sqlite_connection_factory
+
+
+def sqlite_store(tmp_path):
+    pool = ConnectionPool(sqlite_connection_factory(os.path.join(tmp_path, "data_map.db")), dialect="sqlite")
+    store = DataMapStore(pool)
+    store.create_schema()
+    return store
+
+
+def test_edits_from_replicas_meet_in_the_store(tmp_path):
+    store = sqlite_store(tmp_path)
+    first, second = DataMapReplica(store), DataMapReplica(store)
+    with second.edit() as data_map:
+        # The first replica writes while the second is editing, the second's write conflicts, pulls the first
+        # one's change and is retried
+        with first.edit() as other:
+            other.add_node("P", PROCESSING_ACTIVITY)
+        data_map.add_node("R", ASSET)
+    assert sorted(node.name for node in first.refresh(force=True).nodes()) == ["P", "R"]
+    assert sorted(node.name for node in store.load()[0].nodes()) == ["P", "R"]
+
+
+def test_deleting_a_node_deletes_links_written_by_a_stale_replica(tmp_path):
+    store = sqlite_store(tmp_path)
+    first = DataMapReplica(store)
+    with first.edit() as data_map:
+        data_map.add_node("P", PROCESSING_ACTIVITY)
+        data_map.add_node("R", ASSET)
+    second = DataMapReplica(store)
+    with second.edit() as data_map:
+        # The first replica links P while the second is editing, the second's write conflicts and pulls the link,
+        # which it skips because it already removed P, so its retry only writes the node deletion
+        with first.edit() as other:
+            other.add_edge("P", "R")
+        data_map.remove_node("P")
+
+    with store.pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT source, target FROM data_map_edges")
+        assert cursor.fetchall() == []
+        cursor.close()
+    loaded, _ = store.load()
+    assert [node.name for node in loaded.nodes()] == ["R"]
+    assert loaded.edges() == []
+    assert first.refresh(force=True).edges() == []
+
+
+def test_load_drops_edges_to_missing_nodes():
+    data_map = DataMap.from_records([("R", ASSET, None, {})], [("P", "R")])
+    assert data_map.edges() == []
+    assert data_map.predecessors("R") == []
+
+
+def test_failed_edit_is_neither_stored_nor_kept(tmp_path):
+    store = sqlite_store(tmp_path)
+    replica = DataMapReplica(store)
+    try:
+        with replica.edit() as data_map:
+            data_map.add_node("P", PROCESSING_ACTIVITY)
+            raise RuntimeError("form failed")
+    except RuntimeError:
+        pass
+    assert len(replica.data_map) == 0
+    assert len(store.load()[0]) == 0
@@ -0,0 +1,137 @@
+import heapq
+import time
+
+from data_map import ASSET, ATTRS_CHANGE, EDGE_CHANGE, MODEL, NODE_CHANGE, PROCESSING_ACTIVITY, VENDOR, DataMap
+from instrumentation import metrics
+
+# How much exposing a data element adds to a vendor's risk, elements not listed count as DEFAULT_SENSITIVITY
+ELEMENT_SENSITIVITY = {"SSN": 10.0, "Address": 4.0, "Phone Number": 3.0, "Name": 2.0, "Email": 2.0}
+DEFAULT_SENSITIVITY = 1.0
+ASSET_WEIGHT = 1.0
+ACTIVITY_WEIGHT = 0.5
+# A vendor none of whose activities has consent scores this many times its exposure, a fully covered one 1x
+UNCONSENTED_FACTOR = 2.0
+
+
+class VendorRisk:
+    __slots__ = ("vendor", "score", "elements", "assets", "activities", "models", "coverage")
+
+    def __init__(self, vendor: str, elements, assets, activities, models, coverage: float):
+        self.vendor = vendor
+        self.elements = elements
+        self.assets = assets
+        self.activities = activities
+        self.models = models
+        self.coverage = coverage
+        exposure = sum(ELEMENT_SENSITIVITY.get(element, DEFAULT_SENSITIVITY) for element in elements)
+        exposure += ASSET_WEIGHT * len(assets) + ACTIVITY_WEIGHT * len(activities)
+        self.score = round(exposure * (UNCONSENTED_FACTOR - (UNCONSENTED_FACTOR - 1) * coverage), 2)
+
+
+class VendorRiskIndex:
+    def __init__(self, data_map: DataMap):
+        self.data_map = data_map
+        self.version = None
+        self.stats = {"runs": 0, "rebuilt": 0, "rescored": 0, "seconds": 0.0}
+        self._risks = {}
+        # Activity -> vendors it counts towards, to rescore only those when the activity's consent changes
+        self._by_activity = {}
+        self._consented = set()
+
+    def risk(self, vendor: str):
+        return self._risks.get(vendor)
+
+    def top(self, n: int):
+        return heapq.nlargest(n, self._risks.values(), key=lambda risk: (risk.score, risk.vendor))
+
+    def __len__(self):
+        return len(self._risks)
+
+    def _kind(self, name: str):
+        node = self.data_map.node(name)
+        return node.kind if node is not None else None
+
+    def _vendors_near(self, name: str):
+        # Vendors whose score can depend on the node: those it links to directly and those linked from the assets
+        # and activities next to it
+        data_map = self.data_map
+        vendors = [target for target in data_map.successors(name) if self._kind(target) == VENDOR]
+        for neighbour in data_map.successors(name) + data_map.predecessors(name):
+            if self._kind(neighbour) in (ASSET, PROCESSING_ACTIVITY):
+                vendors += [target for target in data_map.successors(neighbour) if self._kind(target) == VENDOR]
+        return vendors
+
+    def _score(self, vendor: str):
+        # A vendor is exposed to the assets and activities linking to it, the assets those activities use, the
+        # activities using those assets and the inputs of the models calling it
+        data_map = self.data_map
+        assets, activities, models = {}, {}, {}
+        for source in data_map.predecessors(vendor):
+            kind = self._kind(source)
+            if kind == ASSET:
+                assets[source] = None
+                activities.update(dict.fromkeys(name for name in data_map.predecessors(source)
+                                                if self._kind(name) == PROCESSING_ACTIVITY))
+            elif kind == PROCESSING_ACTIVITY:
+                activities[source] = None
+                assets.update(dict.fromkeys(name for name in data_map.successors(source) if self._kind(name) == ASSET))
+            elif kind == MODEL:
+                models[source] = None
+        elements = {}
+        for asset in assets:
+            elements.update(dict.fromkeys(data_map.elements(asset)))
+        for model in models:
+            elements.update(dict.fromkeys(data_map.node(model).attrs.get("elements", ())))
+        coverage = sum(activity in self._consented for activity in activities) / len(activities) if activities else 0.0
+        return VendorRisk(vendor, list(elements), list(assets), list(activities), list(models), coverage)
+
+    def _rescore(self, vendor: str):
+        previous = self._risks.pop(vendor, None)
+        if previous is not None:
+            for activity in previous.activities:
+                vendors = self._by_activity[activity]
+                del vendors[vendor]
+                if not vendors:
+                    del self._by_activity[activity]
+        if self._kind(vendor) != VENDOR:
+            return
+        risk = self._score(vendor)
+        self._risks[vendor] = risk
+        for activity in risk.activities:
+            self._by_activity.setdefault(activity, {})[vendor] = None
+        self.stats["rescored"] += 1
+
+    @metrics.timed("vendor_risk.update")
+    def update(self, consented=None):
+        # consented is the set of processing activities with granted consent, None keeps the last one
+        consented = self._consented if consented is None else set(consented)
+        if self.version == self.data_map.version and consented == self._consented:
+            return
+        started = time.perf_counter()
+        changes = None if self.version is None else self.data_map.changes_since(self.version)
+        flipped = consented ^ self._consented
+        self._consented = consented
+        if changes is None:
+            self._risks, self._by_activity = {}, {}
+            dirty = dict.fromkeys(self.data_map.names(VENDOR))
+            self.stats["rebuilt"] += 1
+        else:
+            dirty = {}
+            for activity in flipped:
+                dirty.update(self._by_activity.get(activity, {}))
+            for change, key, _ in changes:
+                if change == EDGE_CHANGE:
+                    for name in key:
+                        if name in self._risks or self._kind(name) == VENDOR:
+                            dirty[name] = None
+                        else:
+                            dirty.update(dict.fromkeys(self._vendors_near(name)))
+                elif change == NODE_CHANGE and (key in self._risks or self._kind(key) == VENDOR):
+                    dirty[key] = None
+                elif change == ATTRS_CHANGE and self._kind(key) == MODEL:
+                    dirty.update(dict.fromkeys(self._vendors_near(key)))
+        for vendor in dirty:
+            self._rescore(vendor)
+        self.version = self.data_map.version
+        self.stats["runs"] += 1
+        self.stats["seconds"] = time.perf_counter() - started
@@ -0,0 +1,244 @@
+import hashlib
+import html
+import re
+import shutil
+import subprocess
+
+from cache import LRUCache
+from data_map import ASSET, DATA_ELEMENT, EDGE_CHANGE, MODEL, NODE_CHANGE, PROCESSING_ACTIVITY, VENDOR, DataMap
+from instrumentation import metrics
+
+ROOT_NODE = "Data Map"
+
+# Node attribute configurations for different categories
+NODE_COLORS = {
+    PROCESSING_ACTIVITY: "#1BB3F0",
+    ASSET: "orange",
+    MODEL: "yellow",
+    VENDOR: "#CD9F4A",
+    DATA_ELEMENT: "#CCF01B",
+}
+
+# Define colors for different categories (for legend)
+LEGEND_LABELS = {
+    PROCESSING_ACTIVITY: "Processing Activities",
+    ASSET: "Assets",
+    MODEL: "Models",
+    VENDOR: "Vendors",
+    DATA_ELEMENT: "Data Elements",
+}
+
+
+def quote(name: str):
+    # Backslashes first, a trailing one would otherwise escape the closing quote
+    return '"' + name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def html_label(text: str):
+    return f"<<b>{html.escape(text, quote=False)}</b>>"
+
+
+def _build_legend():
+    rows = "".join(
+        f'<tr><td width="20" height="20" bgcolor="{NODE_COLORS[kind]}">&nbsp;</td><td align="left">{label}</td></tr>'
+        for kind, label in LEGEND_LABELS.items()
+    )
+    return (
+        '\tlegend [label=<<table border="0" cellborder="0" cellspacing="2" cellpadding="2">'
+        f'<tr><td colspan="2" align="left"><b>Legend</b></td></tr>{rows}</table>> shape=plaintext]\n'
+    )
+
+
+HEADER = (
+    "// Data Map Visualization\n"
+    "digraph {\n"
+    '\tnode [fontname="Helvetica bold" fontsize=12]\n'
+    f"\t{quote(ROOT_NODE)} [label={html_label(ROOT_NODE)} color=lightgrey shape=folder style=filled]\n"
+)
+LEGEND = _build_legend()
+FOOTER = "}\n"
+
+
+def node_fragment(node):
+    fragment = f"\t{quote(node.name)} [label={html_label(node.label)} color={quote(NODE_COLORS[node.kind])} style=filled]\n"
+    if node.kind in (PROCESSING_ACTIVITY, ASSET):
+        # Processing Activities and Assets hang off the root node
+        fragment += f"\t{quote(ROOT_NODE)} -> {quote(node.name)}\n"
+    return fragment
+
+
+def edge_fragment(edge):
+    source, target = edge
+    return f"\t{quote(source)} -> {quote(target)}\n"
+
+
+class DotRenderer:
+    def __init__(self, data_map: DataMap):
+        self.data_map = data_map
+        self.version = None
+        self.stats = {"cached": 0, "incremental": 0, "rebuilt": 0}
+        self._node_fragments = {}
+        self._edge_fragments = {}
+        self._source = None
+        self._digest = None
+
+    def _rebuild(self):
+        self._node_fragments = {node.name: node_fragment(node) for node in self.data_map.nodes()}
+        self._edge_fragments = {edge: edge_fragment(edge) for edge in self.data_map.edges()}
+        self.stats["rebuilt"] += 1
+
+    def _apply(self, changes):
+        for change, key, added in changes:
+            if change == NODE_CHANGE:
+                node = self.data_map.node(key) if added else None
+                if node is None:
+                    self._node_fragments.pop(key, None)
+                else:
+                    self._node_fragments[key] = node_fragment(node)
+            elif change == EDGE_CHANGE:
+                if added and self.data_map.has_edge(*key):
+                    self._edge_fragments[key] = edge_fragment(key)
+                else:
+                    self._edge_fragments.pop(key, None)
+        self.stats["incremental"] += 1
+
+    @metrics.timed("data_map.dot")
+    def source(self):
+        if self.version == self.data_map.version:
+            self.stats["cached"] += 1
+            return self._source
+        changes = None if self.version is None else self.data_map.changes_since(self.version)
+        if changes is None:
+            self._rebuild()
+        else:
+            self._apply(changes)
+        self._source = "".join([
+            HEADER,
+            *self._node_fragments.values(),
+            *self._edge_fragments.values(),
+            LEGEND,
+            FOOTER,
+        ])
+        self.version = self.data_map.version
+        self._digest = None
+        return self._source
+
+    def digest(self):
+        source = self.source()
+        if self._digest is None:
+            self._digest = hashlib.sha256(source.encode()).hexdigest()
+        return self._digest
+
+
+CLUSTER_LABELS = {
+    PROCESSING_ACTIVITY: "Processing Activities",
+    ASSET: "Assets",
+    VENDOR: "Vendors",
+    MODEL: "Models",
+}
+
+
+def collapsed_node_fragment(node, element_count: int):
+    label = html.escape(node.label, quote=False)
+    if element_count:
+        # Data elements are collapsed into a count badge on their owner
+        label += f'<br/><font point-size="10">{element_count} data elements</font>'
+    return f"\t\t{quote(node.name)} [label=<<b>{label}</b>> color={quote(NODE_COLORS[node.kind])} style=filled]\n"
+
+
+class ClusteredRenderer:
+    def __init__(self, data_map: DataMap, max_nodes_per_cluster: int = 50, max_focus_nodes: int = 200):
+        self.data_map = data_map
+        self.max_nodes_per_cluster = max_nodes_per_cluster
+        self.max_focus_nodes = max_focus_nodes
+        self._key = None
+        self._source = None
+
+    def _overview(self):
+        data_map = self.data_map
+        fragments = [HEADER]
+        shown = set()
+        for kind, label in CLUSTER_LABELS.items():
+            nodes = data_map.nodes(kind)
+            if not nodes:
+                continue
+            fragments.append(f"\tsubgraph {quote('cluster_' + kind)} {{\n\t\tlabel={quote(label)}\n")
+            for node in nodes[:self.max_nodes_per_cluster]:
+                fragments.append(collapsed_node_fragment(node, len(data_map.elements(node.name))))
+                shown.add(node.name)
+            hidden = len(nodes) - self.max_nodes_per_cluster
+            if hidden > 0:
+                fragments.append(f"\t\t{quote(kind + '_more')} [label={quote(f'+{hidden} more')} shape=note]\n")
+            fragments.append("\t}\n")
+            if kind in (PROCESSING_ACTIVITY, ASSET):
+                fragments.extend(f"\t{quote(ROOT_NODE)} -> {quote(node.name)}\n"
+                                 for node in nodes[:self.max_nodes_per_cluster])
+        fragments.extend(edge_fragment(edge) for edge in data_map.edges() if edge[0] in shown and edge[1] in shown)
+        fragments.extend([LEGEND, FOOTER])
+        return "".join(fragments)
+
+    def _subtree(self, focus: str):
+        # Breadth-first walk down from the focused node, bounded so layout time stays predictable
+        data_map = self.data_map
+        selected = {focus: None}
+        for name in data_map.predecessors(focus):
+            if data_map.node(name).kind != DATA_ELEMENT:
+                selected[name] = None
+        frontier = [focus]
+        while frontier and len(selected) < self.max_focus_nodes:
+            next_frontier = []
+            for name in frontier:
+                for successor in data_map.successors(name):
+                    if successor not in selected and len(selected) < self.max_focus_nodes:
+                        selected[successor] = None
+                        next_frontier.append(successor)
+            frontier = next_frontier
+        fragments = [HEADER]
+        fragments.extend(node_fragment(data_map.node(name)) for name in selected)
+        fragments.extend(edge_fragment(edge) for name in selected for edge in
+                         ((name, successor) for successor in data_map.successors(name)) if edge[1] in selected)
+        fragments.extend([LEGEND, FOOTER])
+        return "".join(fragments)
+
+    @metrics.timed("data_map.clustered_dot")
+    def source(self, focus: str = None):
+        if focus is not None and focus not in self.data_map:
+            focus = None
+        key = (self.data_map.version, focus)
+        if key != self._key:
+            self._source = self._overview() if focus is None else self._subtree(focus)
+            self._key = key
+        return self._source
+
+
+_SVG_PROLOGUE = re.compile(r"^.*?(?=<svg)", re.DOTALL)
+
+
+class SvgRenderer:
+    def __init__(self, cache: LRUCache, dot_binary: str = "dot", timeout: float = 60.0):
+        self.cache = cache
+        self.dot_binary = shutil.which(dot_binary)
+        self.timeout = timeout
+
+    @property
+    def available(self):
+        return self.dot_binary is not None
+
+    @metrics.timed("data_map.svg")
+    def render(self, source: str, digest: str = None):
+        # Lays the graph out once on the server, identical DOT sources share one cached SVG
+        if digest is None:
+            digest = hashlib.sha256(source.encode()).hexdigest()
+        svg = self.cache.get(digest)
+        if svg is None:
+            result = subprocess.run(
+                [self.dot_binary, "-Tsvg"],
+                input=source.encode(),
+                capture_output=True,
+                timeout=self.timeout,
+                check=True,
+            )
+            # Drop the XML declaration and doctype so the SVG can be inlined into the page
+            svg = _SVG_PROLOGUE.sub("", result.stdout.decode(), count=1)
+            self.cache.set(digest, svg)
+        return svg